@@ -1,11 +1,12 @@
 import argparse
 import json
+import os
 import subprocess
 import sys
 import traceback
 import time
 import uuid
-import select
+import selectors
 import random
 from datetime import datetime, timedelta, timezone
 
@@ -57,19 +58,26 @@ class Test:
             traceback.print_exc()
             sys.exit(1)
 
+    def get_running_pod_names(self, namespace='default'):
+        """
+        Lists running pods with one argv kubectl call, counted in Python instead of a grep/wc pipeline.
+        resourceVersion=0 is served from the apiserver watch cache, which is fresh enough for polling.
+        """
+        result = subprocess.run(['kubectl', 'get', '--raw', f'/api/v1/namespaces/{namespace}/pods?resourceVersion=0'],
+                                check=True, capture_output=True, text=True)
+        return [p['metadata']['name'] for p in json.loads(result.stdout)['items']
+                if p['status'].get('phase') == 'Running']
+
     def wait_for_pods_to_be_ready(self, namespace='default', expected_pods=0, timeout=1000):
         """
         Waits for all pods in the specified namespace to be ready.
         """
         print(f"Checking for pods in namespace {namespace}...", flush=True)
         start_time = time.time()
-        get_pods_cmd = f"kubectl get pods -n {namespace} --no-headers | grep Running | wc -l"
 
         while time.time() - start_time < timeout:
             try:
-                result = subprocess.run(get_pods_cmd, shell=True,
-                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                running_pods = int(result.stdout.strip())
+                running_pods = len(self.get_running_pod_names(namespace))
                 if running_pods >= expected_pods:
                     print(f"All {expected_pods} pods are up and running in namespace {namespace}.", flush=True)
                     return True
@@ -86,11 +94,8 @@ class Test:
         """
         Dynamically determines the number of nodes (pods) by counting running pods.
         """
-        get_pods_cmd = f"kubectl get pods -n {namespace} --no-headers | grep Running | wc -l"
         try:
-            result = subprocess.run(get_pods_cmd, shell=True,
-                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            num_nodes = int(result.stdout.strip())
+            num_nodes = len(self.get_running_pod_names(namespace))
             print(f"Number of running pods (num_nodes): {num_nodes}", flush=True)
             return num_nodes
         except subprocess.CalledProcessError as e:
@@ -101,9 +106,7 @@ class Test:
         """
         Select a random pod from the list of running pods.
         """
-        command = "kubectl get pods --no-headers | grep Running | awk '{print $1}'"
-        stdout, stderr = self.run_command(command, suppress_output=True)
-        pod_list = stdout.split()
+        pod_list = self.get_running_pod_names()
         if not pod_list:
             raise Exception("No running pods found.")
         return random.choice(pod_list)
@@ -141,14 +144,32 @@ class Test:
             session.stdin.write(f'python3 start.py --message {message}\n')
             session.stdin.flush()
 
+            # Register both pipes once; epoll on Linux, so no fd_set is rebuilt per wake-up
+            sel = selectors.DefaultSelector()
+            sel.register(session.stdout, selectors.EVENT_READ)
+            sel.register(session.stderr, selectors.EVENT_READ)
+
             end_time = time.time() + 3000
-            while time.time() < end_time:
-                reads = [session.stdout.fileno()]
-                ready = select.select(reads, [], [], 5)[0]
-                if ready:
-                    output = session.stdout.readline()
-                    print(output, flush=True)
-                    if 'Received acknowledgment:' in output:
+            acknowledged = False
+            # Raw per-fd byte buffers: each wake-up drains whatever is in the pipe, complete lines or not
+            buffers = {session.stdout: b'', session.stderr: b''}
+            while not acknowledged and time.time() < end_time:
+                events = sel.select(timeout=end_time - time.time())
+                if not events:
+                    # Nothing to read; only now is it worth checking whether kubectl went away
+                    if session.poll() is not None:
+                        print("Session ended before completion.", flush=True)
+                        break
+                    continue
+                for key, _ in events:
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        sel.unregister(key.fileobj)
+                        continue
+                    *lines, buffers[key.fileobj] = (buffers[key.fileobj] + data).split(b'\n')
+                    for line in lines:
+                        print(line.decode(errors='replace'), flush=True)
+                    if key.fileobj is session.stdout and any(b'Received acknowledgment:' in line for line in lines):
                         end_time_log = self._get_malaysian_time().strftime('%Y/%m/%d %H:%M:%S')
                         end_log = {
                             'event': 'gossip_end',
@@ -158,11 +179,13 @@ class Test:
                             'details': f"Gossip propagation completed for message: {message}"
                         }
                         print(json.dumps(end_log), flush=True)
+                        acknowledged = True
                         break
-                if session.poll() is not None:
+                if not sel.get_map():
                     print("Session ended before completion.", flush=True)
                     break
-            else:
+            sel.close()
+            if not acknowledged and time.time() >= end_time:
                 print("Timeout waiting for gossip to complete.", flush=True)
                 return False
 
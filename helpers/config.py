@@ -0,0 +1,28 @@
+import os
+import re
+from datetime import timezone, timedelta
+from operator import itemgetter
+
+# ==========================================
+# 🔧 SHARED CONFIGURATION (one source of truth for every orchestrator)
+# ==========================================
+IMAGE_NAME = "wwiras/simcl2"
+IMAGE_TAG = "v25"  # simcl2/ image built from this tree; the injection paths rely on its node code
+TOPOLOGY_FOLDER = "topology"
+HELM_CHART_FOLDER = "simcl2"
+CHART_PATH = os.path.abspath(os.path.join(HELM_CHART_FOLDER, "chartsim"))
+KUBECONFIG_PATH = os.path.abspath("kubeconfig-experiment")
+MTYPE = "e2-medium"
+
+EXPERIMENT_DURATION = 3
+BASE_TRIGGER_TIMEOUT = 10
+TIMEOUT_INCREMENT = 2
+NUM_REPEAT_TESTS = 3
+TOPOLOGY_CONFIGMAP = "bcgossip-topology"
+TOPO_HASH_KEY = "bcgossip/topo-hash"
+PODS_RAW_URL = "/api/v1/namespaces/default/pods?labelSelector=app%3Dbcgossip&resourceVersion=0"
+CONFIGMAP_LIMIT = 1000000  # ConfigMaps are capped at 1 MiB
+NODES_RE = re.compile(r"nodes(\d+)")
+by_node_count = itemgetter('node_count')
+
+MYT = timezone(timedelta(hours=8))
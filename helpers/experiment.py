@@ -0,0 +1,373 @@
+import os
+import asyncio
+import time
+import subprocess
+import random
+import logging
+import json
+import hashlib
+import numpy as np
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import client, config, watch
+
+# orjson parses/serializes topologies in C and hands back bytes that go straight to a pipe
+try:
+    from orjson import loads as json_loads, dumps as json_dumps
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj): return json.dumps(obj, separators=(',', ':')).encode()
+
+from helpers.config import (BASE_TRIGGER_TIMEOUT, CONFIGMAP_LIMIT, KUBECONFIG_PATH, MTYPE, TIMEOUT_INCREMENT,
+                            TOPO_HASH_KEY, TOPOLOGY_CONFIGMAP)
+
+# kubectl stderr that means the API server is shedding load rather than the command failing
+THROTTLE_MARKERS = ("connection refused", "429", "too many requests")
+
+def log(msg): logging.info(msg)
+
+# ==========================================
+# 🛠️ HELPER CLASS (shared by orchestrator3.py and orchestrator_temp.py)
+# ==========================================
+class ExperimentHelper:
+    def __init__(self, cluster_name, zone, project_id, node_count=3, inject_via="configmap"):
+        self.cluster_name = cluster_name
+        self.zone = zone
+        self.project_id = project_id
+        self.node_count = node_count
+        self.inject_via = inject_via
+        self.v1 = None
+        self._pod_cache = {}
+        self._limit, self._active = 1, 0
+        self._gate = threading.Condition()
+        self._recent = deque(maxlen=50)
+
+    def connect_api(self):
+        """One CoreV1Api for the whole run, so pod queries share a keep-alive HTTPS session instead of forking kubectl."""
+        config.load_kube_config(config_file=KUBECONFIG_PATH)
+        self.v1 = client.CoreV1Api()
+
+    def ensure_kube_cache_dirs(self):
+        """kubectl refetches API discovery on every call when ~/.kube/cache is missing or read-only."""
+        for path in ("~/.kube/cache/discovery", "~/.kube/http-cache"):
+            path = os.path.expanduser(path)
+            try: os.makedirs(path, exist_ok=True)
+            except OSError: pass
+            if not os.access(path, os.W_OK):
+                log(f"⚠️ {path} is not writable. kubectl will refetch discovery data on every call.")
+
+    def create_cluster_if_missing(self):
+        """`describe` answers in ~1s; `create` is only issued when the cluster is not already RUNNING."""
+        probe = subprocess.run(["gcloud", "container", "clusters", "describe", self.cluster_name,
+                                "--zone", self.zone, "--project", self.project_id, "--format=value(status)"],
+                               capture_output=True, text=True)
+        if probe.returncode == 0 and probe.stdout.strip() == "RUNNING": return None
+        return subprocess.run(["gcloud", "container", "clusters", "create", self.cluster_name,
+                               "--zone", self.zone, "--num-nodes", str(self.node_count),
+                               "--machine-type", MTYPE, "--quiet"], capture_output=True, text=True)
+
+    def run_command(self, command, shell=True, suppress_output=False, capture=True):
+        """stdout is only piped (and decoded) when the caller wants it back; stderr stays bytes until it is logged."""
+        discard = suppress_output or not capture
+        try:
+            result = subprocess.run(command, check=True, shell=shell, stderr=subprocess.PIPE,
+                                    stdout=subprocess.DEVNULL if discard else subprocess.PIPE)
+            return "" if discard else result.stdout.decode().strip()
+        except subprocess.CalledProcessError as e:
+            if not suppress_output:
+                log(f"❌ Error executing: {e.cmd}\nStderr: {e.stderr.decode(errors='replace').strip()}")
+            raise e
+
+    def run_command_with_retry(self, cmd, timeout=60, retries=5, input=None):
+        """Merged from prepare.py - Handles GKE API Server saturation."""
+        for attempt in range(retries):
+            try:
+                if isinstance(input, str): input = input.encode()
+                result = subprocess.run(cmd, check=True, capture_output=True, timeout=timeout, input=input)
+                self._note_attempt()
+                return True, result.stdout.decode().strip()
+            except subprocess.CalledProcessError as e:
+                err = e.stderr.decode().strip().lower()
+                self._note_attempt(err)
+                if "connection" in err or "refused" in err:
+                    time.sleep(random.uniform(3.0, 7.0) * (attempt + 1))
+                else:
+                    time.sleep(1)
+            except Exception:
+                time.sleep(2)
+        return False, "API Server unavailable after retries."
+
+    async def run_command_with_retry_async(self, cmd, timeout=60, retries=5, input=None):
+        """Event-loop twin of run_command_with_retry: same backoff, but a pending kubectl costs no OS thread."""
+        if isinstance(input, str): input = input.encode()
+        for attempt in range(retries):
+            proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE,
+                                                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            try:
+                out, err = await asyncio.wait_for(proc.communicate(input), timeout=timeout)
+            except asyncio.TimeoutError:
+                proc.kill(); await proc.communicate()
+                await asyncio.sleep(2); continue
+            self._note_attempt(err.decode().lower() if proc.returncode else "")
+            if proc.returncode == 0: return True, out.decode().strip()
+            err = err.decode().strip().lower()
+            if "connection" in err or "refused" in err:
+                await asyncio.sleep(random.uniform(3.0, 7.0) * (attempt + 1))
+            else:
+                await asyncio.sleep(1)
+        return False, "API Server unavailable after retries."
+
+    def _note_attempt(self, err=""):
+        """Rolling window of recent kubectl attempts; once >10% are throttled the injection concurrency is halved.
+        In-flight commands drain, and new ones only start while fewer than the new limit are running."""
+        with self._gate:
+            self._recent.append(any(m in err for m in THROTTLE_MARKERS))
+            if len(self._recent) >= 10 and sum(self._recent) * 10 > len(self._recent) and self._limit > 1:
+                self._limit //= 2; self._recent.clear()
+                log(f"  ⚠️ API server is pushing back; injection concurrency halved to {self._limit}.")
+
+    def _set_concurrency(self, n, max_concurrent=None):
+        """Enough kubectl processes to cover the pods, capped by what this machine can fork and babysit."""
+        self._limit = max_concurrent or min(n, max(8, (os.cpu_count() or 4) * 4))
+        self._active = 0; self._recent.clear()
+        return self._limit
+
+    def get_pod_mapping(self, topology_data, pods=None):
+        """Determines neighbor IP mapping based on deployment vs topology file. `pods` is a sorted (name, ip) list."""
+        if pods is None:
+            try: items = self._list_pods()
+            except Exception: return None
+            pods = sorted((p.metadata.name, p.status.pod_ip) for p in items if p.status.pod_ip)
+        gossip_index = {f'gossip-{index}': index for index in range(len(pods))}
+        ips = np.array([ip for _, ip in pods], dtype=object)
+
+        # Edges become pod-index arrays; row keeps each pod's neighbors in file order after the sort
+        edges = topology_data['edges']
+        # Node ids are str()-ed and looked up once each, not at every edge endpoint
+        index_of = {n: gossip_index.get(str(n), -1) for n in {e[end] for e in edges for end in ('source', 'target')}}
+        src = np.fromiter((index_of[e['source']] for e in edges), np.int32, len(edges))
+        dst = np.fromiter((index_of[e['target']] for e in edges), np.int32, len(edges))
+        weight = np.fromiter((e['weight'] for e in edges), np.float64, len(edges))
+        row = np.arange(len(edges))
+        if not topology_data.get('directed', False):
+            src, dst = np.concatenate((src, dst)), np.concatenate((dst, src))
+            weight, row = np.concatenate((weight, weight)), np.concatenate((row, row))
+        known = (src >= 0) & (dst >= 0)
+        src, dst, weight, row = src[known], dst[known], weight[known], row[known]
+
+        order = np.lexsort((row, src))
+        bounds = np.cumsum(np.bincount(src, minlength=len(pods)))[:-1]
+        # Python lists only for the JSON payloads
+        return {name: list(zip(ips[d].tolist(), w.tolist()))
+                for (name, _), d, w in zip(pods, np.split(dst[order], bounds), np.split(weight[order], bounds))}
+
+    def _apply_neighbors_cmd(self, pod_name):
+        # --notify: pods are reused across a node-count group, and a loaded node only reloads when told
+        return ['kubectl', 'exec', '-i', '--request-timeout=30s', pod_name, '--', 'python3', 'apply_neighbors.py',
+                '--notify']
+
+    def update_pod_db(self, pod_name, neighbors):
+        """Injects neighbor data into the remote pod's SQLite DB via the image's apply_neighbors.py."""
+        with self._gate:
+            self._gate.wait_for(lambda: self._active < self._limit); self._active += 1
+        try: return self.run_command_with_retry(self._apply_neighbors_cmd(pod_name), input=json_dumps(neighbors))
+        finally:
+            with self._gate: self._active -= 1; self._gate.notify_all()
+
+    async def _update_all_pods(self, mapping):
+        cond, active = asyncio.Condition(), 0
+
+        async def update(pod_name):
+            nonlocal active
+            async with cond:
+                await cond.wait_for(lambda: active < self._limit); active += 1
+            try:
+                return await self.run_command_with_retry_async(self._apply_neighbors_cmd(pod_name),
+                                                               input=json_dumps(mapping[pod_name]))
+            finally:
+                async with cond: active -= 1; cond.notify_all()
+
+        return await asyncio.gather(*(update(p) for p in mapping))
+
+    def inject_topology(self, topology_path, max_concurrent=None, expected_pods=None, timeout=600):
+        """Orchestrates the full injection process for a specific topology.
+        Pass expected_pods right after a Helm install to inject each pod as it turns Ready.
+        max_concurrent defaults to a per-machine cap that backs off while the API server is throttling."""
+        with open(topology_path, 'rb') as f:
+            topo_data = json_loads(f.read())
+        if expected_pods: return self._inject_as_ready(topo_data, expected_pods, max_concurrent, timeout)
+
+        mapping = self.get_pod_mapping(topo_data)
+        if not mapping: return False
+        if self.inject_via == "configmap":
+            cm_body = self._topology_configmap(mapping)
+            if cm_body: return self.publish_topology(cm_body, len(mapping))
+            log("  ↪️ Topology too large for one ConfigMap. Falling back to per-pod exec.")
+
+        log(f"💉 Injecting topology into {len(mapping)} pods (Concurrency: {self._set_concurrency(len(mapping), max_concurrent)})...")
+        success_count = unchanged = 0
+        # One event loop drives every kubectl exec; the condition caps how many are in flight
+        results = asyncio.run(self._update_all_pods(mapping))
+        for p, (success, output) in zip(mapping, results):
+            if success: success_count += 1; unchanged += output == "UNCHANGED"
+            else: log(f"  - Failed {p}: {output}")
+        if unchanged: log(f"  ↪️ {unchanged} pods already had this topology; DB rewrite skipped.")
+        return success_count == len(mapping)
+
+    def _list_pods(self, namespace='default', ttl=3):
+        """Raw bcgossip pod items, shared by every pod query for `ttl` seconds so one API call serves them all."""
+        cached = self._pod_cache.get(namespace)
+        if cached and time.time() - cached[0] < ttl: return cached[1]
+        items = self.v1.list_namespaced_pod(namespace, label_selector='app=bcgossip', resource_version='0',
+                                            _request_timeout=10).items
+        self._pod_cache[namespace] = (time.time(), items)
+        return items
+
+    def invalidate_pod_cache(self):
+        self._pod_cache.clear()
+
+    def _inject_as_ready(self, topo_data, expected_pods, max_concurrent, timeout, namespace='default'):
+        """Watches the fresh deployment and hands each Ready pod to the pool, hiding the slowest pod's start-up."""
+        workers = self._set_concurrency(expected_pods, max_concurrent)
+        log(f"💉 Injecting topology into {expected_pods} pods as they become Ready (Concurrency: {workers})...")
+        pod_ips, ready, mapping, futures, cm_body = {}, set(), None, {}, None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            w = watch.Watch()
+            for event in w.stream(self.v1.list_namespaced_pod, namespace, label_selector='app=bcgossip',
+                                  timeout_seconds=timeout):
+                pod = event['object']; name = pod.metadata.name
+                if event['type'] == 'DELETED':
+                    pod_ips.pop(name, None); ready.discard(name); continue
+                if pod.status.pod_ip: pod_ips[name] = pod.status.pod_ip
+                if any(c.type == 'Ready' and c.status == 'True' for c in pod.status.conditions or []): ready.add(name)
+
+                # Neighbor lists carry IPs, so the mapping needs every pod scheduled (not Ready) first
+                if mapping is None and len(pod_ips) == expected_pods:
+                    mapping = self.get_pod_mapping(topo_data, sorted(pod_ips.items()))
+                    cm_body = self._topology_configmap(mapping) if self.inject_via == "configmap" else None
+                    # Nodes pick up their own entry as they start, so there is nothing left to watch for here
+                    if cm_body: w.stop(); break
+                if mapping is None: continue
+                for p in ready - futures.keys():
+                    if p in mapping: futures[p] = executor.submit(self.update_pod_db, p, mapping[p])
+                if len(futures) == expected_pods: w.stop()
+
+            if cm_body: return self.publish_topology(cm_body, expected_pods, namespace, timeout)
+            if len(futures) < expected_pods:
+                raise Exception(f"Pods scale-up failed ({len(ready)}/{expected_pods} Ready).")
+            log(f"✅ Pods are READY ({expected_pods}/{expected_pods}).")
+
+            success_count = 0
+            for p, future in futures.items():
+                success, output = future.result()
+                if success: success_count += 1
+                else: log(f"  - Failed {p}: {output}")
+        return success_count == expected_pods
+
+    def _topology_configmap(self, mapping):
+        """Every pod's neighbor list as one ConfigMap (keyed by pod name), or None if it would exceed the size cap."""
+        data = {pod: json_dumps(neighbors).decode() for pod, neighbors in mapping.items()}
+        if sum(len(k) + len(v) for k, v in data.items()) > CONFIGMAP_LIMIT: return None
+        topo_hash = hashlib.blake2b(json.dumps(data, sort_keys=True).encode(), digest_size=8).hexdigest()
+        return client.V1ConfigMap(metadata=client.V1ObjectMeta(name=TOPOLOGY_CONFIGMAP, annotations={TOPO_HASH_KEY: topo_hash}),
+                                  data=data)
+
+    def publish_topology(self, cm_body, expected_pods, namespace='default', timeout=300):
+        """One API write instead of one exec per pod: each node watches the ConfigMap, applies its own entry and
+        stamps its pod with the topology hash, which is what we wait on here."""
+        try: self.v1.replace_namespaced_config_map(TOPOLOGY_CONFIGMAP, namespace, cm_body)
+        except client.exceptions.ApiException as e:
+            if e.status != 404: raise
+            self.v1.create_namespaced_config_map(namespace, cm_body)
+        topo_hash = cm_body.metadata.annotations[TOPO_HASH_KEY]
+        log(f"💉 Published topology {topo_hash} for {expected_pods} pods via ConfigMap {TOPOLOGY_CONFIGMAP}...")
+
+        def acknowledged(pods):
+            return sum((p.metadata.annotations or {}).get(TOPO_HASH_KEY) == topo_hash for p in pods.values()) >= expected_pods
+        if self._wait_for_pods(acknowledged, namespace, timeout):
+            log(f"✅ All {expected_pods} nodes applied the topology.")
+            return True
+        log("⚠️ Not every node acknowledged the topology in time.")
+        return False
+
+    def get_running_pod_names(self, namespace='default'):
+        """Advisory pod list served from the apiserver watch cache (resourceVersion=0), so it may lag by
+        a few milliseconds. The Ready watches (_inject_as_ready, wait_for_pods_to_be_ready) remain the authoritative
+        "all N ready" check."""
+        return [p.metadata.name for p in self._list_pods(namespace) if p.status.phase == 'Running']
+
+    def get_current_running_pod_count(self, namespace='default'):
+        try: return sum(1 for p in self._list_pods(namespace) if p.status.phase == 'Running')
+        except: return 0
+
+    def select_random_pod(self):
+        pod_list = self.get_running_pod_names()
+        if not pod_list: raise Exception("No running pods found.")
+        return random.choice(pod_list)
+
+    async def trigger_gossip_hybrid(self, pod_name, test_id, cycle_index):
+        current_timeout = BASE_TRIGGER_TIMEOUT + ((cycle_index - 1) * TIMEOUT_INCREMENT)
+        log(f"⚡ Triggering Gossip in {pod_name} (Msg: {test_id})")
+        
+        process = await asyncio.create_subprocess_exec(
+            'kubectl', 'exec', pod_name, '--', 'python3', 'start.py', '--message', test_id,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+        try:
+            # start.py exits right after printing the ACK, so one communicate() covers the early exit too
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=current_timeout)
+        except asyncio.TimeoutError:
+            log(f"⏱️ Trigger Timeout ({current_timeout}s) reached.")
+            process.kill(); await process.communicate()
+            return False
+
+        for line in stdout.splitlines():
+            if b"Received acknowledgment" in line and test_id.encode() in line:
+                log(f"✅ VALID ACK RECEIVED for {test_id}!")
+                return True
+        return False
+
+    def _wait_for_pods(self, done, namespace='default', timeout=300):
+        """Blocks until done({name: V1Pod}) holds, waking on watch events rather than a fixed poll.
+        A dropped watch falls back to re-listing with a capped exponential back-off; 401/403 are raised."""
+        deadline, delay = time.time() + timeout, 0.5
+        while time.time() < deadline:
+            try:
+                listing = self.v1.list_namespaced_pod(namespace, label_selector='app=bcgossip', _request_timeout=10)
+                pods = {p.metadata.name: p for p in listing.items}
+                if done(pods): return True
+                w = watch.Watch()
+                for event in w.stream(self.v1.list_namespaced_pod, namespace, label_selector='app=bcgossip',
+                                      resource_version=listing.metadata.resource_version,
+                                      timeout_seconds=max(1, int(deadline - time.time()))):
+                    pod = event['object']
+                    if event['type'] == 'DELETED': pods.pop(pod.metadata.name, None)
+                    else: pods[pod.metadata.name] = pod
+                    if done(pods): w.stop(); return True
+            except client.exceptions.ApiException as e:
+                # Missing credentials/RBAC won't fix themselves by waiting
+                if e.status in (401, 403): raise
+                log(f"  ⚠️ Pod watch interrupted ({e.status} {e.reason}); re-listing.")
+            except Exception as e:
+                log(f"  ⚠️ Pod watch interrupted ({type(e).__name__}: {e}); re-listing.")
+            time.sleep(max(0, min(delay, deadline - time.time()))); delay = min(delay * 2, 10)
+        return False
+
+    def wait_for_pods_to_be_ready(self, namespace='default', expected_pods=0, timeout=600):
+        log(f"⏳ Waiting for {expected_pods} pods to become Ready...")
+        def all_ready(pods):
+            return sum(any(c.type == 'Ready' and c.status == 'True' for c in p.status.conditions or [])
+                       for p in pods.values()) >= expected_pods
+        if not self._wait_for_pods(all_ready, namespace, timeout): return False
+        log(f"✅ Pods are READY ({expected_pods}/{expected_pods}).")
+        return True
+
+    def wait_for_cleanup(self, namespace='default', timeout=300):
+        log("⏳ Ensuring all previous pods are terminated...")
+        # We check for any pods with the label, even if not 'Running'
+        if self._wait_for_pods(lambda pods: not pods, namespace, timeout):
+            log("✅ Environment cleared.")
+            return True
+        log("⚠️ Timeout waiting for pod cleanup. Proceeding anyway...")
+        return False
@@ -0,0 +1,12 @@
+import json
+import subprocess
+
+from helpers.config import PODS_RAW_URL
+
+
+def list_gossip_pods():
+    """One argv kubectl call (no shell/grep/wc); returns (total, running) bcgossip pod counts.
+    resourceVersion=0 lets the apiserver answer from its watch cache instead of etcd; fine for polling."""
+    res = subprocess.run(['kubectl', 'get', '--raw', PODS_RAW_URL], capture_output=True)
+    items = json.loads(res.stdout)['items'] if res.returncode == 0 else []
+    return len(items), sum(1 for p in items if p['status'].get('phase') == 'Running')
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import glob
 import time
 import subprocess
@@ -12,8 +13,10 @@ import string
 import secrets
 import csv
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
+
+from helpers.config import CHART_PATH, MYT, TOPOLOGY_FOLDER
+from helpers.pods import list_gossip_pods
 
 # ==========================================
 # 🔧 PARAMETER PARSING
@@ -33,9 +36,6 @@ K8SNODE_COUNT = args.k8snodes
 IMAGE_TAG = args.image_tag
 
 # IMAGE_TAG = "v19"
-TOPOLOGY_FOLDER = "topology"
-HELM_CHART_FOLDER = "simcl2"
-MYT = timezone(timedelta(hours=8))
 
 # ==========================================
 # 📝 LOGGING SETUP
@@ -48,12 +48,12 @@ unique_run_id = ''.join(secrets.choice(string.digits + string.ascii_letters) for
 full_log_path = os.path.join(LOG_DIR, f"orchestrator_{timestamp_str}_{unique_run_id}.log")
 full_csv_path = os.path.join(LOG_DIR, f"orchestrator_{timestamp_str}_{unique_run_id}.csv")
 
+# Both handlers already flush once per record and logging flushes/closes them at exit
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S",
-                    handlers=[logging.FileHandler(full_log_path), logging.StreamHandler()])
+                    handlers=[logging.FileHandler(full_log_path, delay=True), logging.StreamHandler()])
 
 def log(msg):
     logging.info(msg)
-    for handler in logging.getLogger().handlers: handler.flush()
 
 # ==========================================
 # 🛠️ INTEGRATED EXPERIMENT HELPER
@@ -70,35 +70,36 @@ class ExperimentHelper:
         pods.sort(key=lambda x: x[0])
         return pods 
 
-    def inject_single_node(self, pod_name, neighbor_data):
-        neighbors_json = json.dumps(neighbor_data)
-        python_script = f"""
-import sqlite3, json, sys
-try:
-    data = json.loads('{neighbors_json.replace("'", "\\'")}')
-    with sqlite3.connect('ned.db') as conn:
-        conn.execute('BEGIN TRANSACTION')
-        conn.execute('DROP TABLE IF EXISTS NEIGHBORS')
-        conn.execute('CREATE TABLE NEIGHBORS (pod_ip TEXT PRIMARY KEY, weight REAL)')
-        conn.executemany('INSERT INTO NEIGHBORS VALUES (?, ?)', data)
-        conn.commit()
-    
-    import grpc, gossip_pb2_grpc
-    from google.protobuf.empty_pb2 import Empty
-    with grpc.insecure_channel('localhost:5050') as chan:
-        gossip_pb2_grpc.GossipServiceStub(chan).UpdateNeighbors(Empty(), timeout=10)
-    print("SUCCESS")
-except Exception as e:
-    print(f"ERROR: {{e}}")
-    sys.exit(1)
-"""
-        try:
-            self.run_command(['kubectl', 'exec', pod_name, '--', 'python3', '-c', python_script], shell=False)
-            return True
-        except:
-            return False
+    async def inject_single_node(self, pod_name, neighbor_data, sem):
+        # apply_neighbors.py reads the list from stdin, writes ned.db and (--notify) pings UpdateNeighbors
+        cmd = ['kubectl', 'exec', '-i', pod_name, '--', 'python3', 'apply_neighbors.py', '--notify']
+        payload = json.dumps(neighbor_data, separators=(',', ':')).encode()
+        async with sem:
+            try:
+                proc = await asyncio.create_subprocess_exec(*cmd, stdin=subprocess.PIPE,
+                                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                await proc.communicate(payload)
+                return proc.returncode == 0
+            except OSError:
+                return False
+
+    async def inject_all_nodes(self, pod_details, neighbor_map, max_concurrent):
+        """One event loop drives every pod's kubectl exec; the semaphore caps how many run at once."""
+        sem = asyncio.Semaphore(max_concurrent)
+
+        async def inject(i, pod_name):
+            # The logical index picks the neighbors; get them or an empty list
+            return pod_name, await self.inject_single_node(pod_name, neighbor_map.get(f'gossip-{i}', []), sem)
+
+        success_count = 0
+        for done in asyncio.as_completed([inject(i, name) for i, (name, _) in enumerate(pod_details)]):
+            pod_name, ok = await done
+            if ok:
+                success_count += 1
+            else:
+                log(f"⚠️ Pod {pod_name} failed topology injection.")
+        return success_count
 
-    
     def push_topology(self, topology_path, pod_details):
         with open(topology_path) as f:
             topo = json.load(f)
@@ -111,46 +112,31 @@ except Exception as e:
         # We use 'gossip-i' as the universal key format to match ip_map
         neighbor_map = {f'gossip-{i}': [] for i in range(len(pod_details))}
         
+        # Each node id is normalized to its 'gossip-X' key once, not at every edge endpoint
+        keys = {}
+        for node in {e[end] for e in topo['edges'] for end in ('source', 'target')}:
+            n = str(node)
+            keys[node] = n if n.startswith('gossip-') else f'gossip-{n}'
+        undirected = not topo.get('directed', False)
+
         for edge in topo['edges']:
-            s = str(edge['source'])
-            t = str(edge['target'])
+            src_key = keys[edge['source']]
+            tgt_key = keys[edge['target']]
             w = edge.get('weight', 0)
 
-            # Ensure keys are in 'gossip-X' format to match neighbor_map keys
-            src_key = s if s.startswith('gossip-') else f'gossip-{s}'
-            tgt_key = t if t.startswith('gossip-') else f'gossip-{t}'
-
             # Add neighbors only if both pods exist in the current deployment
             if src_key in neighbor_map and tgt_key in ip_map:
                 neighbor_map[src_key].append((ip_map[tgt_key], w))
             
             # Handle undirected graphs
-            if not topo.get('directed', False):
-                if tgt_key in neighbor_map and src_key in ip_map:
-                    neighbor_map[tgt_key].append((ip_map[src_key], w))
+            if undirected and tgt_key in neighbor_map and src_key in ip_map:
+                neighbor_map[tgt_key].append((ip_map[src_key], w))
 
         log(f"💉 Injecting topology into {len(pod_details)} pods (Parallel)...")
         
         # 3. Parallel Injection
-        success_count = 0
-        # Increased max_workers for larger clusters (>100 nodes)
-        workers = min(len(pod_details), 50) 
-        
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            # We iterate through pod_details to get the physical name and logical index
-            futures = {}
-            for i, (pod_name, pod_ip) in enumerate(pod_details):
-                logical_id = f'gossip-{i}'
-                data = neighbor_map.get(logical_id, []) # Get neighbors or empty list
-                futures[executor.submit(self.inject_single_node, pod_name, data)] = pod_name
-            
-            for future in as_completed(futures):
-                if future.result():
-                    success_count += 1
-                else:
-                    failed_name = futures[future]
-                    log(f"⚠️ Pod {failed_name} failed topology injection.")
-        
+        # Each exec is still a kubectl process, so at most 50 run at once
+        success_count = asyncio.run(self.inject_all_nodes(pod_details, neighbor_map, 50))
         return success_count == len(pod_details)
 
 # ==========================================
@@ -158,7 +144,6 @@ except Exception as e:
 # ==========================================
 def main():
     helper = ExperimentHelper()
-    ROOT_DIR = os.getcwd()
     test_summary = []
 
     log("\n" + "="*50)
@@ -215,12 +200,7 @@ def main():
                 cleanup_start = time.time()
                 while True:
                     # Poll kubectl for any pods with the app label
-                    check_pods = subprocess.run(
-                        "kubectl get pods -l app=bcgossip --no-headers", 
-                        shell=True, capture_output=True, text=True
-                    )
-                    
-                    if not check_pods.stdout.strip():
+                    if list_gossip_pods()[0] == 0:
                         log("✅ Cluster is 100% clean.")
                         break
                     
@@ -233,11 +213,9 @@ def main():
                     time.sleep(3) # Polling interval
 
                 # 3. Fresh Helm Install
-                os.chdir(HELM_CHART_FOLDER)
                 log(f"📦 Installing Helm chart with totalNodes={expected_nodes}...")
-                subprocess.run(f"helm install simcn ./chartsim --set totalNodes={expected_nodes},image.tag={IMAGE_TAG}", 
-                               shell=True, check=True, capture_output=True)
-                os.chdir(ROOT_DIR)
+                subprocess.run(["helm", "install", "simcn", CHART_PATH, "--set", f"totalNodes={expected_nodes},image.tag={IMAGE_TAG}"],
+                               check=True, capture_output=True)
 
                 # 4. READY BARRIER: Wait for new pods to reach 'Running'
                 log(f"⏳ Waiting for exactly {expected_nodes} pods to be 'Running'...")
@@ -246,9 +224,7 @@ def main():
                 wait_start = time.time()
                 
                 while time.time() - wait_start < timeout_limit:
-                    res = subprocess.run("kubectl get pods -l app=bcgossip --no-headers | grep Running | wc -l", 
-                                         shell=True, capture_output=True, text=True)
-                    current_count = int(res.stdout.strip() or 0)
+                    _, current_count = list_gossip_pods()
                     
                     if current_count == expected_nodes:
                         log(f"✅ Pod count MATCHES: {current_count}/{expected_nodes}")
@@ -289,7 +265,7 @@ def main():
                 target_pod = pod_details[0][0] 
                 
                 try:
-                    subprocess.run(f"kubectl exec {target_pod} -- python3 start.py --message {msg}", shell=True, check=True)
+                    subprocess.run(['kubectl', 'exec', target_pod, '--', 'python3', 'start.py', '--message', msg], check=True)
                     log(f"      ⏳ Propagating for {EXPERIMENT_DURATION}s...")
                     time.sleep(EXPERIMENT_DURATION + 2)
                     
@@ -312,8 +288,7 @@ def main():
             # 2. Wait for pods to fully terminate
             log("⏳ Waiting for all gossip pods to terminate...")
             while True:
-                check_pods = subprocess.run("kubectl get pods -l app=bcgossip --no-headers", shell=True, capture_output=True, text=True)
-                if not check_pods.stdout.strip():
+                if list_gossip_pods()[0] == 0:
                     log("✅ All pods cleared.")
                     break
                 time.sleep(5)
@@ -8,7 +8,10 @@ import secrets
 import csv
 import argparse
 import logging
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
+
+from helpers.config import CHART_PATH, IMAGE_TAG, MYT, TOPOLOGY_FOLDER
+from helpers.pods import list_gossip_pods
 
 # ==========================================
 # 🔧 PARAMETERS & CONFIG
@@ -25,13 +28,9 @@ ZONE = args.zone
 K8SCLUSTER_NAME = args.cluster_name
 K8SNODE_COUNT = args.k8snodes
 
-IMAGE_TAG = "v22"
-TOPOLOGY_FOLDER = "topology"
-HELM_CHART_FOLDER = "simcl2"
 REMOTE_PROJECT_DIR = "~/adaptiveBCproj/adaptiveBC" # Path in Cloud Shell
 EXPERIMENT_DURATION = 10
 NUM_REPEAT_TESTS = 3
-MYT = timezone(timedelta(hours=8))
 
 # ==========================================
 # 📝 LOGGING SETUP
@@ -44,18 +43,17 @@ unique_run_id = ''.join(secrets.choice(string.digits + string.ascii_letters) for
 full_log_path = os.path.join(LOG_DIR, f"orchestrator_{timestamp_str}_{unique_run_id}.log")
 full_csv_path = os.path.join(LOG_DIR, f"orchestrator_{timestamp_str}_{unique_run_id}.csv")
 
+# Both handlers already flush once per record and logging flushes/closes them at exit
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S",
-                    handlers=[logging.FileHandler(full_log_path), logging.StreamHandler()])
+                    handlers=[logging.FileHandler(full_log_path, delay=True), logging.StreamHandler()])
 
 def log(msg):
     logging.info(msg)
-    for handler in logging.getLogger().handlers: handler.flush()
 
 # ==========================================
 # 🚀 MAIN ORCHESTRATOR
 # ==========================================
 def main():
-    ROOT_DIR = os.getcwd()
     test_summary = []
     last_p2p_count = 0 
 
@@ -103,21 +101,17 @@ def main():
                 # Termination Barrier
                 log("⏳ Waiting for zero-pod state...")
                 while True:
-                    check = subprocess.run("kubectl get pods -l app=bcgossip --no-headers", shell=True, capture_output=True, text=True)
-                    if not check.stdout.strip(): break
+                    if list_gossip_pods()[0] == 0: break
                     time.sleep(5)
 
-                os.chdir(HELM_CHART_FOLDER)
-                subprocess.run(f"helm install simcn ./chartsim --set totalNodes={expected_nodes},image.tag={IMAGE_TAG}", shell=True, check=True, capture_output=True)
-                os.chdir(ROOT_DIR)
+                subprocess.run(["helm", "install", "simcn", CHART_PATH, "--set", f"totalNodes={expected_nodes},image.tag={IMAGE_TAG}"], check=True, capture_output=True)
 
                 # Ready Barrier
                 log(f"⏳ Waiting for {expected_nodes} pods to reach 'Running'...")
                 wait_start = time.time()
                 ready_success = False
                 while time.time() - wait_start < (120 + expected_nodes*2):
-                    res = subprocess.run("kubectl get pods -l app=bcgossip --no-headers | grep Running | wc -l", shell=True, capture_output=True, text=True)
-                    count = int(res.stdout.strip() or 0)
+                    _, count = list_gossip_pods()
                     if count == expected_nodes:
                         log(f"✅ Cluster scaled and ready.")
                         time.sleep(15) # Stabilization cooldown
@@ -145,7 +139,7 @@ def main():
                     f"gcloud cloud-shell ssh --authorize-session --command='"
                     f"gcloud container clusters get-credentials {K8SCLUSTER_NAME} --zone {ZONE} --project {PROJECT_ID} && "
                     f"cd {REMOTE_PROJECT_DIR} && "
-                    f"python3 prepare_new.py --filename {filename}'"
+                    f"python3 prepare.py --mode two-phase --filename {filename}'"
                 )
                 
                 process = subprocess.Popen(remote_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
@@ -178,7 +172,7 @@ def main():
                 log(f"   🔄 [Run {run_idx}/{NUM_REPEAT_TESTS}] Triggering: {msg}")
                 
                 try:
-                    subprocess.run(f"kubectl exec {target_pod} -- python3 start.py --message {msg}", shell=True, check=True)
+                    subprocess.run(['kubectl', 'exec', target_pod, '--', 'python3', 'start.py', '--message', msg], check=True)
                     log(f"      ⏳ Propagating ({EXPERIMENT_DURATION}s)...")
                     time.sleep(EXPERIMENT_DURATION + 2)
                     
@@ -1,19 +1,21 @@
 import os
-import glob
+import asyncio
 import time
 import subprocess
-import re
-import random
-import select
 import logging
 import sys
-import json
-import uuid
 import string
 import secrets
 import csv
 import argparse # Added for variables
-from datetime import datetime, timezone, timedelta
+import prepare
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+from helpers.config import (CHART_PATH, EXPERIMENT_DURATION, IMAGE_NAME, IMAGE_TAG, KUBECONFIG_PATH, MTYPE,
+                            MYT, NODES_RE, NUM_REPEAT_TESTS, TOPOLOGY_FOLDER, by_node_count)
+from helpers.experiment import ExperimentHelper
 
 # ==========================================
 # 🔧 ARGUMENT PARSING (Dynamic Variables)
@@ -34,23 +36,9 @@ ZONE = args.zone
 K8SCLUSTER_NAME = args.cluster_name
 K8SNODE_COUNT = args.k8snodes
 
-IMAGE_NAME = "wwiras/simcl2"
-IMAGE_TAG = "v17"
-TOPOLOGY_FOLDER = "topology"
-HELM_CHART_FOLDER = "simcl2"
-MTYPE = "e2-medium" 
-
-# EXPERIMENT_DURATION = 10
-EXPERIMENT_DURATION = 3    
-BASE_TRIGGER_TIMEOUT = 10   
-TIMEOUT_INCREMENT = 2       
-NUM_REPEAT_TESTS = 3        
-
 # ==========================================
-# 🛠️ HELPERS & TIMEZONE
+# 🛠️ HELPERS
 # ==========================================
-MYT = timezone(timedelta(hours=8))
-
 def get_short_id(length=5):
     characters = string.digits + string.ascii_letters
     return ''.join(secrets.choice(characters) for _ in range(length))
@@ -87,103 +75,46 @@ logging.Formatter.converter = lambda *args: datetime.now(MYT).timetuple()
 def log(msg):
     logging.info(msg)
 
-# ==========================================
-# 🛠️ HELPER CLASS
-# ==========================================
-class ExperimentHelper:
-    def run_command(self, command, shell=True, suppress_output=False, capture=True):
-        try:
-            result = subprocess.run(
-                command, 
-                check=True, 
-                text=True, 
-                capture_output=capture, 
-                shell=shell
-            )
-            return result.stdout.strip() if capture else ""
-        except subprocess.CalledProcessError as e:
-            if not suppress_output:
-                log(f"❌ Error executing: {e.cmd}\nStderr: {getattr(e, 'stderr', 'Check console')}")
-            raise e
-
-    def get_current_running_pod_count(self, namespace='default'):
-        try:
-            cmd = f"kubectl get pods -n {namespace} -l app=bcgossip --no-headers | grep Running | wc -l"
-            count = self.run_command(cmd, suppress_output=True)
-            return int(count) if count else 0
-        except:
-            return 0
-
-    def wait_for_pods_to_be_ready(self, namespace='default', expected_pods=0, timeout=600):
-        log(f"⏳ Waiting for {expected_pods} pods to reach Running state...")
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            running_pods = self.get_current_running_pod_count(namespace)
-            if running_pods >= expected_pods:
-                log(f"✅ Real-time Check: {running_pods}/{expected_pods} pods are READY.")
-                return True
-            time.sleep(5)
-        return False
-
-    def select_random_pod(self):
-        cmd = "kubectl get pods -l app=bcgossip --no-headers | grep Running | awk '{print $1}'"
-        stdout = self.run_command(cmd)
-        pod_list = stdout.split()
-        if not pod_list: raise Exception("No running pods found.")
-        return random.choice(pod_list)
-
-    def trigger_gossip_hybrid(self, pod_name, test_id, cycle_index):
-        current_timeout = BASE_TRIGGER_TIMEOUT + ((cycle_index - 1) * TIMEOUT_INCREMENT)
-        log(f"⚡ Triggering Gossip in {pod_name} (Msg: {test_id})")
-        
-        cmd = ['kubectl', 'exec', pod_name, '--', 'python3', 'start.py', '--message', test_id]
-        start_time = time.time()
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
-
-        while True:
-            if time.time() - start_time > current_timeout:
-                log(f"⏱️ Trigger Timeout ({current_timeout}s) reached.")
-                process.kill()
-                return False 
-
-            reads = [process.stdout.fileno()]
-            ready = select.select(reads, [], [], 1.0)[0]
-
-            if ready:
-                line = process.stdout.readline()
-                if not line: break 
-                if "Received acknowledgment" in line and test_id in line:
-                    log(f"✅ VALID ACK RECEIVED for {test_id}!")
-                    process.terminate() 
-                    return True
-            
-            if process.poll() is not None: break
-        return False
-
 # ==========================================
 # 🚀 MAIN ORCHESTRATOR
 # ==========================================
 def main():
-    helper = ExperimentHelper()
-    ROOT_DIR = os.getcwd() 
+    helper = ExperimentHelper(K8SCLUSTER_NAME, ZONE, PROJECT_ID, K8SNODE_COUNT)
     test_summary = []  
+    helper.ensure_kube_cache_dirs()
+
+    # One kubeconfig for the whole run; every kubectl/helm child inherits it and reuses the cached token
+    os.environ["KUBECONFIG"] = KUBECONFIG_PATH
+    credentials_cmd = [
+        "gcloud", "container", "clusters", "get-credentials", K8SCLUSTER_NAME,
+        "--zone", ZONE, "--project", PROJECT_ID
+    ]
+    # Speculative: on reruns the cluster already exists, so the fetch overlaps scanning and the create check
+    cred_pool = ThreadPoolExecutor(max_workers=1)
+    cred_future = cred_pool.submit(subprocess.run, credentials_cmd, capture_output=True, text=True)
+    cred_pool.shutdown(wait=False)
     
     # 1. TOPOLOGY SCANNING
-    raw_files = glob.glob(os.path.join(TOPOLOGY_FOLDER, "*.json"))
+    if not os.path.isdir(TOPOLOGY_FOLDER):
+        log("❌ No topology files found in the /topology folder.")
+        return
+
     topology_list = []
 
-    for filepath in raw_files:
-        filename = os.path.basename(filepath)
-        node_match = re.search(r"nodes(\d+)", filename)
-        # Use args.p2pnodes as the fallback if regex finds nothing
-        node_count = int(node_match.group(1)) if node_match else args.p2pnodes
-        topology_list.append({
-            "path": filepath,
-            "filename": filename,
-            "node_count": node_count
-        })
-
-    topology_list.sort(key=lambda x: x['node_count'])
+    with os.scandir(TOPOLOGY_FOLDER) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            node_match = NODES_RE.search(entry.name)
+            # Use args.p2pnodes as the fallback if regex finds nothing
+            node_count = int(node_match.group(1)) if node_match else args.p2pnodes
+            topology_list.append({
+                "path": entry.path,
+                "filename": entry.name,
+                "node_count": node_count
+            })
+
+    topology_list.sort(key=by_node_count)
     
     if not topology_list: 
         log("❌ No topology files found in the /topology folder.")
@@ -216,64 +147,71 @@ def main():
             log(f"❌ CRITICAL ERROR: {e.stderr}")
             sys.exit(1) 
 
-    subprocess.run([
-        "gcloud", "container", "clusters", "get-credentials", K8SCLUSTER_NAME, 
-        "--zone", ZONE, "--project", PROJECT_ID
-    ], check=True)
+    # The speculative fetch fails when the cluster was only just created; fetch again in that case
+    if cred_future.result().returncode != 0:
+        subprocess.run(credentials_cmd, check=True)
+    helper.connect_api()
 
     # 3. EXPERIMENT LOOP
     try:
-        for i, topo in enumerate(topology_list):
-            filename = topo['filename']
-            p2p_nodes = topo['node_count']
-            unique_id = get_short_id(5)
-            
-            # This is the base ID used for extraction in BigQuery
-            base_test_id = f"{unique_id}-cubaan{p2p_nodes}"
-
-            log(f"\n[{i+1}/{len(topology_list)}] 🚀 TOPOLOGY: {filename}")
-            log(f"   👉 Base Test ID: {base_test_id}")
+        processed = 0
+        # topology_list is sorted by node_count, so each group needs at most one Helm install
+        for p2p_nodes, group in groupby(topology_list, key=by_node_count):
 
-            # --- A. CONDITIONAL HELM DEPLOYMENT ---
+            # --- A. CONDITIONAL HELM DEPLOYMENT (once per node-count group) ---
             current_workload = helper.get_current_running_pod_count()
             if current_workload != p2p_nodes:
-                log(f"🔄 Scaling pods from {current_workload} to {p2p_nodes}...")
+                log(f"\n🔄 Scaling pods from {current_workload} to {p2p_nodes}...")
                 try:
                     helper.run_command("helm uninstall simcn", suppress_output=True)
                     time.sleep(5) 
                 except: pass
+                helper.invalidate_pod_cache()
 
-                os.chdir(HELM_CHART_FOLDER)
-                try:
-                    helm_cmd = (f"helm install simcn ./chartsim --set testType=default,"
-                                f"totalNodes={p2p_nodes},image.tag={IMAGE_TAG},image.name={IMAGE_NAME}")
-                    helper.run_command(helm_cmd, capture=False)
-                finally:
-                    os.chdir(ROOT_DIR)
+                helm_cmd = ["helm", "install", "simcn", CHART_PATH, "--set",
+                            f"testType=default,totalNodes={p2p_nodes},image.tag={IMAGE_TAG},image.name={IMAGE_NAME}"]
+                helper.run_command(helm_cmd, shell=False, capture=False)
+                helper.invalidate_pod_cache()
 
                 if not helper.wait_for_pods_to_be_ready(expected_pods=p2p_nodes):
                     raise Exception("Pods scale-up failed.")
-            
-            # --- B. INJECT TOPOLOGY ---
-            subprocess.run(f"python3 prepare.py --filename {filename}", shell=True, check=True)
-
-            # Record test metadata
-            test_summary.append({
-                "test_id": base_test_id,
-                "topology": filename,
-                "pods": p2p_nodes,
-                "timestamp": datetime.now(MYT).strftime('%Y-%m-%d %H:%M:%S')
-            })
-
-            # --- C. REPEAT TEST LOOP ---
-            for run_idx in range(1, NUM_REPEAT_TESTS + 1):
-                message = f"{base_test_id}-{run_idx}"
-                log(f"   🔄 [Run {run_idx}/{NUM_REPEAT_TESTS}] Message: {message}")
-                pod = helper.select_random_pod()
-                helper.trigger_gossip_hybrid(pod, message, cycle_index=run_idx)
 
-                log(f"      ⏳ Propagating for {EXPERIMENT_DURATION}s...")
-                time.sleep(EXPERIMENT_DURATION + 2)
+            # Every topology in this group targets the same pods, so list them once
+            dplymt = prepare.get_pod_dplymt()
+
+            for topo in group:
+                processed += 1
+                filename = topo['filename']
+                unique_id = get_short_id(5)
+                
+                # This is the base ID used for extraction in BigQuery
+                base_test_id = f"{unique_id}-cubaan{p2p_nodes}"
+
+                log(f"\n[{processed}/{len(topology_list)}] 🚀 TOPOLOGY: {filename}")
+                log(f"   👉 Base Test ID: {base_test_id}")
+
+                # --- B. INJECT TOPOLOGY (in-process, no interpreter start-up) ---
+                if not prepare.inject(filename, TOPOLOGY_FOLDER, dplymt):
+                    log("⚠️ Topology injection failed. Skipping this topology.")
+                    continue
+
+                # Record test metadata
+                test_summary.append({
+                    "test_id": base_test_id,
+                    "topology": filename,
+                    "pods": p2p_nodes,
+                    "timestamp": datetime.now(MYT).strftime('%Y-%m-%d %H:%M:%S')
+                })
+
+                # --- C. REPEAT TEST LOOP ---
+                for run_idx in range(1, NUM_REPEAT_TESTS + 1):
+                    message = f"{base_test_id}-{run_idx}"
+                    log(f"   🔄 [Run {run_idx}/{NUM_REPEAT_TESTS}] Message: {message}")
+                    pod = helper.select_random_pod()
+                    asyncio.run(helper.trigger_gossip_hybrid(pod, message, cycle_index=run_idx))
+
+                    log(f"      ⏳ Propagating for {EXPERIMENT_DURATION}s...")
+                    time.sleep(EXPERIMENT_DURATION + 2)
 
     except Exception as e:
         log(f"❌ CRITICAL ERROR DURING EXPERIMENT: {e}")
@@ -1,154 +1,657 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import abc
 import argparse
+import asyncio
+import re
 import json
 import subprocess
 import sys
+import tempfile
 import os
 import time
 import random
+from array import array
+from itertools import count
+
+# numpy builds the topology arrays and the CSR mapping vectorized; plain lists/arrays are the fallback
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# simdjson indexes the document with SIMD and hands back lazy proxies; plain json is the fallback
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# orjson parses and serializes in C and hands back bytes; stdlib json with compact separators is the fallback
+try:
+    from orjson import loads as json_loads, dumps as json_dumps
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj): return json.dumps(obj, separators=(',', ':')).encode()
+
+# In-process API client: one kubeconfig load and HTTPS session for every lookup; kubectl is the fallback
+try:
+    from kubernetes import client as k8s_client, config as k8s_config
+except ImportError:
+    k8s_client = None
+
+# The generated gossip stubs live next to the node code in simcl2/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simcl2'))
+from apply_neighbors import apply_neighbors
+
+# Only the gRPC paths (one-step, copy-db's reload signal) need grpc and the stubs; two-phase and
+# db-only are kubectl-only and run on hosts with just the stdlib
+try:
+    import grpc
+    import grpc.aio
+    import gossip_pb2
+    import gossip_pb2_grpc
+except ImportError:
+    grpc = None
+
+def require_grpc():
+    if grpc is None:
+        raise ImportError("this --mode talks gRPC to the pods: pip install grpcio protobuf")
 
 # --- HELPER: Robust Command Execution ---
-def run_command_with_retry(cmd, timeout=300, retries=5, backoff=1.5):
+_jitter = random.Random()  # seed via _jitter.seed(n) for reproducible retry timing
+
+def backoff_delay(attempt, backoff=1.5, cap=30.0):
+    """Full jitter: anywhere in [0, min(cap, 0.5 * backoff**attempt)], so workers that
+    failed together don't all come back at the same instant."""
+    return _jitter.uniform(0, min(cap, 0.5 * (backoff ** attempt)))
+
+def run_command_with_retry(cmd, timeout=300, retries=5, backoff=1.5, input=None, cap=30.0):
+    """`input` is raw bytes for the command's stdin (e.g. a serialized protobuf)."""
     last_error = ""
     for attempt in range(retries):
         try:
             result = subprocess.run(
-                cmd, check=True, text=True, capture_output=True, timeout=timeout
+                cmd, check=True, capture_output=True, timeout=timeout, input=input
             )
-            return True, result.stdout.strip()
+            return True, result.stdout.decode().strip()
         except subprocess.CalledProcessError as e:
-            last_error = f"Exit {e.returncode}: {e.stderr.strip()}"
+            last_error = f"Exit {e.returncode}: {e.stderr.decode(errors='replace').strip()}"
         except subprocess.TimeoutExpired:
             last_error = f"Timed out after {timeout}s"
         except Exception as e:
             last_error = f"Unexpected error: {str(e)}"
 
         if attempt < retries - 1:
-            sleep_time = (backoff ** attempt) + random.uniform(0.5, 1.5)
-            time.sleep(sleep_time)
+            time.sleep(backoff_delay(attempt, backoff, cap))
     return False, f"Failed after {retries} attempts. Last error: {last_error}"
 
+# --- HELPER: Persistent gRPC Channels ---
+CHANNELS_PER_POD = 4
+CHANNEL_OPTIONS = [
+    ('grpc.max_concurrent_streams', 100),
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.http2.max_pings_without_data', 0),
+    # Without a per-channel subchannel pool gRPC would collapse the pool onto one shared connection
+    ('grpc.use_local_subchannel_pool', 1),
+]
+_channels = {}       # "host:port" -> [(channel, stub), ...]; aio channels, so only valid inside one event loop
+_turn = count()
+
+def get_stub(target):
+    """Round-robins over a lazily built pool of channels per pod, so retries and re-runs skip channel setup."""
+    pool = _channels.get(target)
+    if pool is None:
+        pool = _channels[target] = []
+        for _ in range(CHANNELS_PER_POD):
+            channel = grpc.aio.insecure_channel(target, options=CHANNEL_OPTIONS)
+            pool.append((channel, gossip_pb2_grpc.GossipServiceStub(channel)))
+    return pool[next(_turn) % len(pool)][1]
+
+async def close_channels():
+    await asyncio.gather(*(channel.close() for pool in _channels.values() for channel, _ in pool))
+    _channels.clear()
+    for proc, _, drain in _forwards.values():
+        proc.terminate()
+        await proc.wait()
+        drain.cancel()
+    _forwards.clear()
+
+# --- HELPER: Long-lived Port-Forwards ---
+_forwards = {}       # pod_name -> (kubectl process, local port, stdout drain task)
+
+async def forward_port(pod_name, timeout=15):
+    """
+    One long-lived `kubectl port-forward` per unreachable pod: kubectl auth and
+    the API-server hop are paid once, every later RPC is plain localhost gRPC.
+    """
+    if pod_name not in _forwards:
+        proc = await asyncio.create_subprocess_exec(
+            'kubectl', 'port-forward', f'pod/{pod_name}', ':5050',
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        try:
+            line = await asyncio.wait_for(proc.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            line = b""
+        match = re.search(rb'127\.0\.0\.1:(\d+)', line)
+        if not match:
+            proc.kill()
+            await proc.wait()
+            raise RuntimeError(f"port-forward to {pod_name} failed: {line.decode(errors='replace').strip()}")
+        # kubectl logs every forwarded connection; keep reading so the pipe never fills and stalls it
+        drain = asyncio.create_task(proc.stdout.read())
+        _forwards[pod_name] = (proc, int(match.group(1)), drain)
+    return _forwards[pod_name][1]
+
 # --- CORE FUNCTIONS ---
 
 def get_pod_topology(topology_folder, filename):
     topology_file_path = os.path.join(os.getcwd(), topology_folder, filename)
     if not os.path.exists(topology_file_path):
         print(f"Error: Topology file not found at '{topology_file_path}'.", flush=True)
-        sys.exit(1)
+        return None
     try:
-        with open(topology_file_path) as f:
-            return json.load(f)
+        if filename.endswith('.ndjson'):
+            return read_topology_ndjson(topology_file_path)
+        if simdjson:
+            # The parser owns the document, so it must outlive topology_arrays()
+            parser = simdjson.Parser()
+            return topology_arrays(parser.load(topology_file_path))
+        with open(topology_file_path, 'rb') as f:
+            return topology_arrays(json_loads(f.read()))
     except Exception:
         return False
 
-def get_pod_neighbors(topology):
-    neighbor_map = {node['id']: [] for node in topology['nodes']}
-    for edge in topology['edges']:
-        source, target = edge['source'], edge['target']
-        neighbor_map[source].append(target)
-        if not topology['directed']:
-            neighbor_map[target].append(source)
-    return neighbor_map
+def topology_arrays(topology):
+    """
+    Normalizes a JSON topology to {'directed', 'nodes', 'src', 'dst', 'weight'}:
+    node ids in file order plus one typed-array row per edge, with src/dst
+    holding node rows (-1 for ids missing from 'nodes').
+    """
+    nodes = [node['id'] for node in topology['nodes']]
+    row = {node_id: i for i, node_id in enumerate(nodes)}
+    edges = topology['edges']
+    if np is None:
+        return {
+            'directed': topology['directed'],
+            'nodes': nodes,
+            'src': array('i', (row.get(e['source'], -1) for e in edges)),
+            'dst': array('i', (row.get(e['target'], -1) for e in edges)),
+            'weight': array('d', (e['weight'] for e in edges)),
+        }
+    return {
+        'directed': topology['directed'],
+        'nodes': nodes,
+        'src': np.fromiter((row.get(e['source'], -1) for e in edges), np.int32, len(edges)),
+        'dst': np.fromiter((row.get(e['target'], -1) for e in edges), np.int32, len(edges)),
+        'weight': np.fromiter((e['weight'] for e in edges), np.float64, len(edges)),
+    }
+
+def read_topology_ndjson(path):
+    """
+    Streams a line-delimited topology ({"graph": ...}, then {"node": ...} and
+    {"edge": ...} records, one per line) straight into the topology_arrays()
+    layout, so the edge list never exists as Python dicts.
+    """
+    directed, nodes, row = False, [], {}
+    src, dst, weight = array('i'), array('i'), array('d')
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip(): continue
+            record = json_loads(line)
+            if 'edge' in record:
+                edge = record['edge']
+                src.append(row.get(edge['source'], -1))
+                dst.append(row.get(edge['target'], -1))
+                weight.append(edge['weight'])
+            elif 'node' in record:
+                row[record['node']['id']] = len(nodes)
+                nodes.append(record['node']['id'])
+            elif 'graph' in record:
+                directed = record['graph'].get('directed', False)
+    if np is None:
+        return {'directed': directed, 'nodes': nodes, 'src': src, 'dst': dst, 'weight': weight}
+    return {'directed': directed, 'nodes': nodes, 'src': np.frombuffer(src, np.intc).astype(np.int32),
+            'dst': np.frombuffer(dst, np.intc).astype(np.int32), 'weight': np.frombuffer(weight, np.float64)}
+
+def write_topology_ndjson(json_path, ndjson_path=None):
+    """Converts a .json topology to the line-delimited layout read_topology_ndjson() streams."""
+    ndjson_path = ndjson_path or os.path.splitext(json_path)[0] + '.ndjson'
+    with open(json_path) as f:
+        topology = json.load(f)
+    with open(ndjson_path, 'w') as f:
+        f.write(json.dumps({'graph': {'directed': topology['directed']}}) + '\n')
+        for node in topology['nodes']:
+            f.write(json.dumps({'node': node}) + '\n')
+        for edge in topology['edges']:
+            f.write(json.dumps({'edge': edge}) + '\n')
+    return ndjson_path
 
-def get_pod_dplymt():
+DEPLOYMENT = 'gossip-dpymt'
+NAMESPACE = 'default'
+DPLYMT_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'adaptiveBC', 'dplymt.json')
+_api = None
+
+def get_api():
+    """(CoreV1Api, AppsV1Api) built once per process, or None when the client or a kubeconfig is unavailable."""
+    global _api
+    if _api is None:
+        _api = False
+        if k8s_client:
+            try:
+                k8s_config.load_kube_config()
+                _api = (k8s_client.CoreV1Api(), k8s_client.AppsV1Api())
+            except Exception:
+                pass
+    return _api or None
+
+def get_deployment_key():
+    """uid changes on every Helm reinstall, generation on every spec change; together they identify the pod set."""
+    api = get_api()
+    try:
+        if api:
+            meta = api[1].read_namespaced_deployment(DEPLOYMENT, NAMESPACE, _request_timeout=10).metadata
+            return f"{meta.uid}/{meta.generation}"
+        cmd = ['kubectl', 'get', 'deployment', DEPLOYMENT, '-o', 'jsonpath={.metadata.uid}/{.metadata.generation}']
+        return subprocess.run(cmd, check=True, text=True, capture_output=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def list_pods():
+    """[(pod_name, pod_ip)] for the bcgossip pods; a pod without an IP yet raises, as the kubectl parse does."""
+    api = get_api()
+    if api:
+        items = api[0].list_namespaced_pod(NAMESPACE, label_selector='app=bcgossip', _request_timeout=10).items
+        pods = [(p.metadata.name, p.status.pod_ip) for p in items]
+        if not all(ip for _, ip in pods): raise ValueError("a pod has no IP yet")
+        return pods
     cmd = [
         'kubectl', 'get', 'pods', '-l', 'app=bcgossip',
         '-o', 'jsonpath={range .items[*]}{.metadata.name}{" "}{.status.podIP}{"\\n"}{end}'
     ]
+    result = subprocess.run(cmd, check=True, text=True, capture_output=True, timeout=10)
+    return [tuple(line.split()) for line in result.stdout.splitlines() if line]
+
+def get_pod_dplymt(cache=True, ttl=120):
+    """
+    Returns [(index, pod_name, pod_ip)] sorted by name, or False. With cache=True a
+    result saved within `ttl` seconds for the same deployment uid/generation is reused
+    instead of listing pods again (the TTL covers pods rescheduled in place).
+    """
+    key = get_deployment_key() if cache else None
+    if key:
+        try:
+            if time.time() - os.path.getmtime(DPLYMT_CACHE) < ttl:
+                with open(DPLYMT_CACHE) as f:
+                    cached = json.load(f)
+                if cached['key'] == key:
+                    return [tuple(pod) for pod in cached['pods']]
+        except (OSError, ValueError, KeyError):
+            pass
+
     try:
-        result = subprocess.run(cmd, check=True, text=True, capture_output=True, timeout=10)
-        if not result.stdout.strip(): return False
-        pods_data = [line.split() for line in result.stdout.splitlines() if line]
+        pods_data = list_pods()
+        if not pods_data: return False
         pods_data.sort(key=lambda x: x[0])
-        return [(i, name, ip) for i, (name, ip) in enumerate(pods_data)]
+        dplymt = [(i, name, ip) for i, (name, ip) in enumerate(pods_data)]
     except Exception:
         return False
 
-def get_pod_mapping(pod_deployment, pod_neighbors, pod_topology):
-    gossip_id_to_ip = {f'gossip-{index}': ip for index, _, ip in pod_deployment}
-    edge_weights_lookup = {}
-    for edge in pod_topology['edges']:
-        s, t, w = edge['source'], edge['target'], edge['weight']
-        edge_weights_lookup[tuple(sorted((s, t)))] = w
-
-    result = {}
-    for index, deployment_name, _ in pod_deployment:
-        gossip_id = f'gossip-{index}'
-        if gossip_id in pod_neighbors:
-            list_with_weights = []
-            for n_id in pod_neighbors[gossip_id]:
-                if n_id in gossip_id_to_ip:
-                    ip = gossip_id_to_ip[n_id]
-                    weight = edge_weights_lookup.get(tuple(sorted((gossip_id, n_id))), 0)
-                    list_with_weights.append((ip, weight))
-            result[deployment_name] = list_with_weights
-    return result
-
-def update_pod_one_step(pod_name, neighbors):
-    """
-    ONE-STEP: Sends the full neighbor list to the pod.
-    The pod's UpdateNeighbors handler handles both DB and Memory.
-    """
-    neighbor_data = [{"ip": ip, "weight": w} for ip, w in neighbors]
-    payload_json = json.dumps(neighbor_data)
+    if key:
+        try:
+            os.makedirs(os.path.dirname(DPLYMT_CACHE), exist_ok=True)
+            with open(DPLYMT_CACHE, 'w') as f:
+                json.dump({'key': key, 'pods': dplymt}, f)
+        except OSError:
+            pass
+    return dplymt
+
+def get_pod_mapping(pod_deployment, pod_topology):
+    """
+    One O(V+E) pass over the topology arrays (row i of src/dst/weight is
+    edge i), grouped by source into CSR indptr/indices/weights.
+    Python tuples are only created for the final per-pod neighbor lists.
+    """
+    ips = [ip for _, _, ip in pod_deployment]
+    gossip_index = {f'gossip-{index}': index for index, _, _ in pod_deployment}
+    # Node row -> pod index; the extra trailing -1 is what a missing (-1) row resolves to
+    pod_of_row = [gossip_index.get(n, -1) for n in pod_topology['nodes']] + [-1]
+    if np is None:
+        return pod_mapping_lists(pod_deployment, pod_topology, ips, pod_of_row)
+    pod_of_row = np.array(pod_of_row, np.int32)
+    src, dst, weight = pod_of_row[pod_topology['src']], pod_of_row[pod_topology['dst']], pod_topology['weight']
+    if not pod_topology['directed']:
+        # Interleave each edge with its reverse so every pod keeps the file's neighbor order
+        src, dst = np.column_stack((src, dst)).ravel(), np.column_stack((dst, src)).ravel()
+        weight = np.repeat(weight, 2)
+    known = (src >= 0) & (dst >= 0)
+    src, dst, weight = src[known], dst[known], weight[known]
 
+    order = np.argsort(src, kind='stable')
+    indices, weights = dst[order], weight[order]
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(src, minlength=len(ips)))))
+
+    names = [name for _, name, _ in pod_deployment]
+    indptr, indices, weights = indptr.tolist(), indices.tolist(), weights.tolist()
+    return {name: [(ips[j], w) for j, w in zip(indices[indptr[k]:indptr[k + 1]], weights[indptr[k]:indptr[k + 1]])]
+            for k, name in enumerate(names)}
+
+def pod_mapping_lists(pod_deployment, pod_topology, ips, pod_of_row):
+    """get_pod_mapping() without numpy: one pass appending straight to each pod's list, same order."""
+    lists = [[] for _ in ips]
+    directed = pod_topology['directed']
+    for s, d, w in zip(pod_topology['src'], pod_topology['dst'], pod_topology['weight']):
+        ps, pd = pod_of_row[s], pod_of_row[d]
+        if ps < 0 or pd < 0: continue
+        lists[ps].append((ips[pd], w))
+        if not directed: lists[pd].append((ips[ps], w))
+    return {name: lists[k] for k, (_, name, _) in enumerate(pod_deployment)}
+
+def serialize_neighbors(neighbors):
+    """Compact JSON bytes for apply_neighbors.py's stdin."""
+    return json_dumps(neighbors)
+
+def to_neighbors(neighbors):
     # Note: We float() the weight to match the double/REAL types
-    python_script = f"""
-import grpc
-import gossip_pb2
-import gossip_pb2_grpc
-import json
-import sys
+    return [gossip_pb2.Neighbor(pod_ip=ip, weight=float(w)) for ip, w in neighbors]
 
-try:
-    data = json.loads('{payload_json}')
-    n_list = [gossip_pb2.Neighbor(pod_ip=n['ip'], weight=float(n['weight'])) for n in data]
-    with grpc.insecure_channel('localhost:5050') as channel:
-        stub = gossip_pb2_grpc.GossipServiceStub(channel)
-        request = gossip_pb2.NeighborList(neighbors=n_list)
-        stub.UpdateNeighbors(request, timeout=15)
-    print("Success")
-except Exception as e:
-    print(f"Error: {{e}}", file=sys.stderr)
-    sys.exit(1)
-"""
-    cmd = ['kubectl', 'exec', pod_name, '--', 'python3', '-c', python_script]
-    return run_command_with_retry(cmd, timeout=60, retries=5)
-
-def update_all_pods(pod_mapping, max_concurrent=50):
-    pod_list = list(pod_mapping.keys())
-    total_pods = len(pod_list)
+async def stream_neighbors(neighbors):
+    for ip, w in neighbors:
+        yield gossip_pb2.Neighbor(pod_ip=ip, weight=float(w))
+
+async def push_neighbors(stub, request, neighbors):
+    """Lists go over UpdateNeighborsStream so the pod decodes rows while the rest arrive (an empty
+    stream installs []); the reload signal stays a unary UpdateNeighbors."""
+    if request.reload:
+        return (await stub.UpdateNeighbors(request, timeout=15)).details
+    return (await stub.UpdateNeighborsStream(stream_neighbors(neighbors), timeout=15)).details
+
+async def update_pods_batch(pod_mapping, pod_ips):
+    """
+    BATCH: One RPC from the driver; the first pod acts as coordinator and fans
+    the lists out over the cluster network. Returns the pods still to update.
+    """
+    coordinator = pod_ips[min(pod_mapping)]
+    ip_to_name = {pod_ips[p]: p for p in pod_mapping}
+    batch = gossip_pb2.NeighborBatch(pods=[
+        gossip_pb2.PodNeighbors(pod_ip=pod_ips[p], neighbors=to_neighbors(n)) for p, n in pod_mapping.items()])
+    try:
+        ack = await get_stub(f"{coordinator}:5050").BatchUpdateNeighbors(batch, timeout=120)
+    except grpc.RpcError as e:
+        print(f"  - Coordinator {coordinator} unavailable ({e.code().name}); pushing to each pod directly.", flush=True)
+        return list(pod_mapping)
+    return [ip_to_name[ip] for ip in ack.failed]
+
+async def update_pod_one_step(pod_name, pod_ip, neighbors, sem, retries=5, backoff=1.5, reload=False):
+    """
+    ONE-STEP: Sends the full neighbor list straight to the pod's gRPC port.
+    The pod's UpdateNeighbors handler handles both DB and Memory, so no
+    kubectl exec (and no interpreter start-up inside the pod) is involved.
+    If the pod IP is unreachable from the driver, the RPC goes through a
+    long-lived kubectl port-forward, and failing that the same protobuf bytes
+    are piped through kubectl exec. reload=True sends the reload-from-ned.db
+    signal instead of a list.
+    """
+    request = gossip_pb2.NeighborList(neighbors=to_neighbors(neighbors), reload=reload)
+    last_error = ""
+    for attempt in range(retries):
+        try:
+            # Only the RPC holds a slot; a pod backing off doesn't block the others
+            async with sem:
+                return True, await push_neighbors(get_stub(f"{pod_ip}:5050"), request, neighbors)
+        except grpc.RpcError as e:
+            last_error = f"{e.code().name}: {e.details()}"
+            if e.code() == grpc.StatusCode.UNAVAILABLE:
+                break
+        if attempt < retries - 1:
+            await asyncio.sleep(backoff_delay(attempt, backoff))
+    else:
+        return False, f"Failed after {retries} attempts. Last error: {last_error}"
+
+    try:
+        port = await forward_port(pod_name)
+        async with sem:
+            return True, await push_neighbors(get_stub(f"127.0.0.1:{port}"), request, neighbors)
+    except (grpc.RpcError, RuntimeError, OSError, asyncio.TimeoutError):
+        pass
+
+    # Last resort: the image's prebuilt gossip-update reads the serialized request from stdin
+    cmd = ['kubectl', 'exec', '-i', pod_name, '--', 'gossip-update']
+    async with sem:
+        return await asyncio.to_thread(run_command_with_retry, cmd, 60, retries, backoff, request.SerializeToString())
+
+# --- POD UPDATE STRATEGIES (--mode) ---
+
+class PodUpdater(abc.ABC):
+    """How one pod receives its neighbor list; update_all_pods() drives any of them."""
+    name = None
+    max_concurrent = 50  # every in-flight kubectl exec is an API-server/kubelet stream
+    notifies = True  # the running node is told to load the new list
+
+    async def start(self, pod_mapping, pod_ips):
+        """Optional bulk step before the per-pod fan-out. Returns the pods still to update."""
+        return list(pod_mapping)
+
+    @abc.abstractmethod
+    async def update(self, pod_name, pod_ip, neighbors, sem):
+        """Delivers one pod's list. Returns (success, output)."""
+
+    def close(self):
+        pass
+
+
+class OneStepUpdater(PodUpdater):
+    """The node's UpdateNeighbors stores and loads the list in one RPC (coordinator batch first)."""
+    name = 'one-step'
+    max_concurrent = 200  # plain RPCs on shared channels; kubectl only on the fallback paths
+
+    def __init__(self, batch=True):
+        require_grpc()
+        self.batch = batch
+
+    async def start(self, pod_mapping, pod_ips):
+        if not self.batch:
+            return list(pod_mapping)
+        remaining = await update_pods_batch(pod_mapping, pod_ips)
+        print(f"Coordinator updated {len(pod_mapping) - len(remaining)}/{len(pod_mapping)} pods.", flush=True)
+        return remaining
+
+    async def update(self, pod_name, pod_ip, neighbors, sem):
+        return await update_pod_one_step(pod_name, pod_ip, neighbors, sem)
+
+
+class DbOnlyUpdater(PodUpdater):
+    """Writes ned.db through the image's apply_neighbors.py without telling the node. Only fresh pods
+    pick it up (lazy load on their first message); a node that already loaded a list keeps it."""
+    name = 'db-only'
+    notifies = False
+    APPLY_CMD = ['python3', 'apply_neighbors.py']
+
+    async def start(self, pod_mapping, pod_ips):
+        # Serialize every payload up front so the exec fan-out only moves bytes. In-process is
+        # fastest: shipping the lists to worker processes costs more pickling than the dumps itself.
+        self.payloads = await asyncio.to_thread(
+            lambda: {pod: serialize_neighbors(neighbors) for pod, neighbors in pod_mapping.items()})
+        return list(pod_mapping)
+
+    async def update(self, pod_name, pod_ip, neighbors, sem):
+        cmd = ['kubectl', 'exec', '-i', pod_name, '--'] + self.APPLY_CMD
+        async with sem:
+            return await asyncio.to_thread(run_command_with_retry, cmd, 60, 5, 1.5, self.payloads[pod_name])
+
+
+class TwoPhaseUpdater(DbOnlyUpdater):
+    """db-only, then the reload signal so the node picks the table up right away. apply_neighbors.py
+    --notify sends it to localhost from inside the same exec, so each pod costs one round trip."""
+    name = 'two-phase'
+    notifies = True
+    APPLY_CMD = DbOnlyUpdater.APPLY_CMD + ['--notify']
+
+
+class CopyDbUpdater(PodUpdater):
+    """
+    Builds every pod's ned.db on the driver (same schema and META fingerprint as
+    apply_neighbors.py), then streams each file into its pod in one exec that
+    swaps it in atomically, followed by the reload signal. The remote pods do
+    no SQLite work at all.
+    """
+    name = 'copy-db'
+    # rename() is atomic, so the node never opens a half-written file
+    REPLACE_CMD = 'cat > ned.db.tmp && mv ned.db.tmp ned.db'
+
+    def __init__(self):
+        require_grpc()
+        self.workdir = tempfile.TemporaryDirectory(prefix='ned-')
+
+    def db_path(self, pod_name):
+        return os.path.join(self.workdir.name, f'{pod_name}.db')
+
+    async def start(self, pod_mapping, pod_ips):
+        def build_all():
+            for pod_name, neighbors in pod_mapping.items():
+                apply_neighbors(json.dumps(neighbors, separators=(',', ':')), self.db_path(pod_name))
+        await asyncio.to_thread(build_all)
+        return list(pod_mapping)
+
+    async def update(self, pod_name, pod_ip, neighbors, sem):
+        with open(self.db_path(pod_name), 'rb') as f:
+            db_bytes = f.read()
+        cmd = ['kubectl', 'exec', '-i', pod_name, '--', 'sh', '-c', self.REPLACE_CMD]
+        async with sem:
+            success, output = await asyncio.to_thread(run_command_with_retry, cmd, 60, 5, 1.5, db_bytes)
+        if not success:
+            return success, output
+        return await update_pod_one_step(pod_name, pod_ip, [], sem, reload=True)
+
+    def close(self):
+        self.workdir.cleanup()
+
+
+UPDATERS = {cls.name: cls for cls in (OneStepUpdater, TwoPhaseUpdater, DbOnlyUpdater, CopyDbUpdater)}
+
+PROGRESS_INTERVAL = 0.25  # seconds between progress-line refreshes
+# Failure text that means the API server (or a pod's gRPC server) is shedding load
+THROTTLE_MARKERS = ("connection to the server", "refused", "429", "too many requests", "resource_exhausted")
+
+class AdaptiveLimit:
+    """
+    AIMD cap on in-flight pod updates, used like a semaphore. Every
+    INCREASE_AFTER clean results raise the cap by INCREASE_STEP (up to
+    ceiling); a throttled result halves it, down to FLOOR or the starting
+    cap if that is lower. Slots already taken drain, and new ones are only
+    handed out below the new cap.
+    """
+    INCREASE_AFTER = 20
+    INCREASE_STEP = 2
+    FLOOR = 4
+
+    def __init__(self, limit, ceiling):
+        self.limit, self.ceiling = limit, ceiling
+        self.floor = min(self.FLOOR, limit)  # a caller-supplied cap below FLOOR is never raised by throttling
+        self.active = self.streak = 0
+        self.cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, *exc):
+        async with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    async def record(self, success, output):
+        async with self.cond:
+            if not success and any(m in output.lower() for m in THROTTLE_MARKERS):
+                self.limit, self.streak = max(self.floor, self.limit // 2), 0
+                print(f"\n  ⚠️ Throttled; concurrency down to {self.limit}.", flush=True)
+            elif success:
+                self.streak += 1
+                if self.streak >= self.INCREASE_AFTER and self.limit < self.ceiling:
+                    self.limit, self.streak = min(self.ceiling, self.limit + self.INCREASE_STEP), 0
+                    self.cond.notify_all()
+
+async def update_all_pods(pod_mapping, pod_ips, max_concurrent=None, updater=None):
+    """pod_ips maps pod name -> pod IP; updater defaults to one-step. After the updater's bulk
+    step, each remaining pod is one coroutine on one thread, an AdaptiveLimit capping how many
+    are in flight. It starts at max_concurrent (the updater's own unless given) and may grow
+    to twice that while no pod reports throttling."""
+    updater = updater or OneStepUpdater()
+    total_pods = len(pod_mapping)
     start_time = time.time()
-    success_count = 0
+    start_limit = max_concurrent or updater.max_concurrent
+    sem = AdaptiveLimit(start_limit, 2 * start_limit)
+
+    completed = success_count = 0
+
+    async def push(pod_name):
+        return pod_name, await updater.update(pod_name, pod_ips[pod_name], pod_mapping[pod_name], sem)
+
+    def show_progress():
+        print(f"\rProgress: {(completed/total_pods)*100:.1f}% | Success: {success_count}/{total_pods}", end='', flush=True)
 
-    print(f"\n[One-Step Update] Pushing topology to {total_pods} pods...", flush=True)
+    async def report_progress():
+        # One write per tick instead of a flush per finished pod
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            show_progress()
 
-    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
-        futures = {executor.submit(update_pod_one_step, p, pod_mapping[p]): p for p in pod_list}
-        for i, future in enumerate(as_completed(futures), 1):
-            success, output = future.result()
+    print(f"\n[{updater.name}] Pushing topology to {total_pods} pods...", flush=True)
+
+    reporter = asyncio.create_task(report_progress())
+    try:
+        remaining = await updater.start(pod_mapping, pod_ips)
+        completed = success_count = total_pods - len(remaining)
+        for done in asyncio.as_completed([push(p) for p in remaining]):
+            pod_name, (success, output) = await done
+            await sem.record(success, output)
+            completed += 1
             if success: success_count += 1
-            else: print(f"\n  - Failed {futures[future]}: {output}")
-            
-            print(f"\rProgress: {(i/total_pods)*100:.1f}% | Success: {success_count}/{total_pods}", end='', flush=True)
+            else: print(f"\n  - Failed {pod_name}: {output}")
+    finally:
+        reporter.cancel()
+        await close_channels()
+        updater.close()
+    show_progress()
 
-    print(f"\n\nTotal Time: {time.time() - start_time:.1f}s")
+    # orchestrator2.py greps this line to confirm a remote injection
+    notified = f", Notification Success: {success_count}" if updater.notifies else ""
+    print(f"\n\nOverall Summary - Total Pods: {total_pods}, DB Update Success: {success_count}{notified}")
+    print(f"Total Time: {time.time() - start_time:.1f}s")
     return success_count == total_pods
 
+def inject(filename, topology_folder="topology", dplymt=None, mode='one-step'):
+    """Pushes a topology file to the running deployment. Returns True once every pod is updated.
+
+    Callers injecting several topologies into the same deployment can pass the
+    result of get_pod_dplymt() once instead of re-listing pods for every file.
+    mode picks the PodUpdater: 'one-step', 'two-phase', 'db-only' or 'copy-db'.
+    """
+    topo = get_pod_topology(topology_folder, filename)
+    if not topo: return False
+    dplymt = dplymt or get_pod_dplymt()
+    if not (dplymt and len(topo['nodes']) == len(dplymt)):
+        print("Error: Topology/Deployment size mismatch.")
+        return False
+    pod_map = get_pod_mapping(dplymt, topo)
+    pod_ips = {name: ip for _, name, ip in dplymt}
+    if pod_map and asyncio.run(update_all_pods(pod_map, pod_ips, updater=UPDATERS[mode]())):
+        print("Platform is now ready for testing..!", flush=True)
+        return True
+    print("Update failed on some pods.", flush=True)
+    return False
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--filename", required=True)
     parser.add_argument("--topology_folder", default="topology")
+    parser.add_argument("--mode", choices=list(UPDATERS), default="one-step",
+                        help="one-step: gRPC push; two-phase: DB write then reload signal; "
+                             "db-only: DB write (fresh pods only); "
+                             "copy-db: DBs built locally and copied in, then reload signal")
+    parser.add_argument("--to_ndjson", action="store_true",
+                        help="Write a line-delimited copy of the .json topology and exit")
     args = parser.parse_args()
 
-    topo = get_pod_topology(args.topology_folder, args.filename)
-    if topo:
-        dplymt = get_pod_dplymt()
-        if dplymt and len(topo['nodes']) == len(dplymt):
-            pod_map = get_pod_mapping(dplymt, get_pod_neighbors(topo), topo)
-            if pod_map and update_all_pods(pod_map):
-                print("Platform is now ready for testing..!", flush=True)
-            else:
-                print("Update failed on some pods.", flush=True)
-        else:
-            print("Error: Topology/Deployment size mismatch.")
\ No newline at end of file
+    if args.to_ndjson:
+        print(write_topology_ndjson(os.path.join(args.topology_folder, args.filename)))
+    else:
+        sys.exit(0 if inject(args.filename, args.topology_folder, mode=args.mode) else 1)
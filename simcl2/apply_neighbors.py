@@ -0,0 +1,65 @@
+# ==============================================================================
+# apply_neighbors.py
+# ==============================================================================
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+
+def apply_neighbors(payload, path='ned.db'):
+    """Replaces the NEIGHBORS table with the [pod_ip, weight] pairs in the JSON payload in one transaction.
+    Returns None without writing when META already holds this payload's fingerprint."""
+    values = json.loads(payload)
+    topo_hash = hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        # One executescript call for the setup; busy_timeout makes SQLite block in C on a busy DB
+        # instead of raising "database is locked" back to Python
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA busy_timeout=30000;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            CREATE TABLE IF NOT EXISTS NEIGHBORS (pod_ip TEXT PRIMARY KEY, weight REAL);
+            CREATE TABLE IF NOT EXISTS META (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        # Re-running the same topology (retry/resume) leaves the table untouched
+        row = conn.execute("SELECT value FROM META WHERE key = 'topo_hash'").fetchone()
+        if row and row[0] == topo_hash:
+            return None
+        with conn:
+            conn.execute('BEGIN IMMEDIATE TRANSACTION')
+            # Clearing rows in place avoids the schema change (and page churn) of DROP/CREATE
+            conn.execute('DELETE FROM NEIGHBORS')
+            conn.executemany('INSERT INTO NEIGHBORS VALUES (?, ?)', values)
+            conn.execute("INSERT OR REPLACE INTO META VALUES ('topo_hash', ?)", (topo_hash,))
+        # Outside the transaction: lets SQLite refresh planner statistics after the bulk rewrite
+        conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+    return len(values)
+
+def notify_node():
+    """Asks the local node to reload NEIGHBORS from ned.db."""
+    import grpc
+    import gossip_pb2
+    import gossip_pb2_grpc
+    with grpc.insecure_channel('localhost:5050') as channel:
+        gossip_pb2_grpc.GossipServiceStub(channel).UpdateNeighbors(gossip_pb2.NeighborList(reload=True), timeout=10)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replace this pod's neighbor list with the JSON read from stdin.")
+    parser.add_argument('--notify', action='store_true', help="Also tell the local node to reload its neighbors")
+    args = parser.parse_args()
+    # The neighbor list arrives on stdin (kubectl exec -i) so no shell quoting is involved
+    try:
+        count = apply_neighbors(sys.stdin.read())
+        # Notify even when unchanged: a retry after a failed notify finds the DB already written
+        if args.notify:
+            notify_node()
+        print("UNCHANGED" if count is None else f"SUCCESS:{count}", flush=True)
+    except Exception as e:
+        print(f"ERROR:{e}", file=sys.stderr)
+        sys.exit(1)
@@ -22,20 +22,29 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
-from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0cgossip.proto\x12\x06gossip\x1a\x1bgoogle/protobuf/empty.proto\"o\n\rGossipMessage\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\x11\n\tsender_id\x18\x02 \x01(\t\x12\x11\n\ttimestamp\x18\x03 \x01(\x03\x12\x12\n\nlatency_ms\x18\x04 \x01(\x01\x12\x13\n\x0bround_count\x18\x05 \x01(\x05\"!\n\x0e\x41\x63knowledgment\x12\x0f\n\x07\x64\x65tails\x18\x01 \x01(\t2\x90\x01\n\rGossipService\x12<\n\x0bSendMessage\x12\x15.gossip.GossipMessage\x1a\x16.gossip.Acknowledgment\x12\x41\n\x0fUpdateNeighbors\x12\x16.google.protobuf.Empty\x1a\x16.gossip.Acknowledgmentb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0cgossip.proto\x12\x06gossip\"o\n\rGossipMessage\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\x11\n\tsender_id\x18\x02 \x01(\t\x12\x11\n\ttimestamp\x18\x03 \x01(\x03\x12\x12\n\nlatency_ms\x18\x04 \x01(\x01\x12\x13\n\x0bround_count\x18\x05 \x01(\x05\"!\n\x0e\x41\x63knowledgment\x12\x0f\n\x07\x64\x65tails\x18\x01 \x01(\t\"*\n\x08Neighbor\x12\x0e\n\x06pod_ip\x18\x01 \x01(\t\x12\x0e\n\x06weight\x18\x02 \x01(\x01\"C\n\x0cNeighborList\x12#\n\tneighbors\x18\x01 \x03(\x0b\x32\x10.gossip.Neighbor\x12\x0e\n\x06reload\x18\x02 \x01(\x08\"C\n\x0cPodNeighbors\x12\x0e\n\x06pod_ip\x18\x01 \x01(\t\x12#\n\tneighbors\x18\x02 \x03(\x0b\x32\x10.gossip.Neighbor\"3\n\rNeighborBatch\x12\"\n\x04pods\x18\x01 \x03(\x0b\x32\x14.gossip.PodNeighbors\"+\n\x08\x42\x61tchAck\x12\x0f\n\x07updated\x18\x01 \x01(\x05\x12\x0e\n\x06\x66\x61iled\x18\x02 \x03(\t2\x94\x02\n\rGossipService\x12<\n\x0bSendMessage\x12\x15.gossip.GossipMessage\x1a\x16.gossip.Acknowledgment\x12?\n\x0fUpdateNeighbors\x12\x14.gossip.NeighborList\x1a\x16.gossip.Acknowledgment\x12\x43\n\x15UpdateNeighborsStream\x12\x10.gossip.Neighbor\x1a\x16.gossip.Acknowledgment(\x01\x12?\n\x14\x42\x61tchUpdateNeighbors\x12\x15.gossip.NeighborBatch\x1a\x10.gossip.BatchAckb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'gossip_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_GOSSIPMESSAGE']._serialized_start=53
-  _globals['_GOSSIPMESSAGE']._serialized_end=164
-  _globals['_ACKNOWLEDGMENT']._serialized_start=166
-  _globals['_ACKNOWLEDGMENT']._serialized_end=199
-  _globals['_GOSSIPSERVICE']._serialized_start=202
-  _globals['_GOSSIPSERVICE']._serialized_end=346
+  _globals['_GOSSIPMESSAGE']._serialized_start=24
+  _globals['_GOSSIPMESSAGE']._serialized_end=135
+  _globals['_ACKNOWLEDGMENT']._serialized_start=137
+  _globals['_ACKNOWLEDGMENT']._serialized_end=170
+  _globals['_NEIGHBOR']._serialized_start=172
+  _globals['_NEIGHBOR']._serialized_end=214
+  _globals['_NEIGHBORLIST']._serialized_start=216
+  _globals['_NEIGHBORLIST']._serialized_end=283
+  _globals['_PODNEIGHBORS']._serialized_start=285
+  _globals['_PODNEIGHBORS']._serialized_end=352
+  _globals['_NEIGHBORBATCH']._serialized_start=354
+  _globals['_NEIGHBORBATCH']._serialized_end=405
+  _globals['_BATCHACK']._serialized_start=407
+  _globals['_BATCHACK']._serialized_end=450
+  _globals['_GOSSIPSERVICE']._serialized_start=453
+  _globals['_GOSSIPSERVICE']._serialized_end=729
 # @@protoc_insertion_point(module_scope)
@@ -3,7 +3,6 @@
 import grpc
 import warnings
 
-from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 import gossip_pb2 as gossip__pb2
 
 GRPC_GENERATED_VERSION = '1.74.0'
@@ -42,9 +41,19 @@ class GossipServiceStub(object):
                 _registered_method=True)
         self.UpdateNeighbors = channel.unary_unary(
                 '/gossip.GossipService/UpdateNeighbors',
-                request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+                request_serializer=gossip__pb2.NeighborList.SerializeToString,
                 response_deserializer=gossip__pb2.Acknowledgment.FromString,
                 _registered_method=True)
+        self.UpdateNeighborsStream = channel.stream_unary(
+                '/gossip.GossipService/UpdateNeighborsStream',
+                request_serializer=gossip__pb2.Neighbor.SerializeToString,
+                response_deserializer=gossip__pb2.Acknowledgment.FromString,
+                _registered_method=True)
+        self.BatchUpdateNeighbors = channel.unary_unary(
+                '/gossip.GossipService/BatchUpdateNeighbors',
+                request_serializer=gossip__pb2.NeighborBatch.SerializeToString,
+                response_deserializer=gossip__pb2.BatchAck.FromString,
+                _registered_method=True)
 
 
 class GossipServiceServicer(object):
@@ -57,12 +66,24 @@ class GossipServiceServicer(object):
         raise NotImplementedError('Method not implemented!')
 
     def UpdateNeighbors(self, request, context):
-        """<-- Add this new RPC
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UpdateNeighborsStream(self, request_iterator, context):
+        """Same as a non-empty UpdateNeighbors, but rows are decoded while the rest are still in flight
         """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchUpdateNeighbors(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_GossipServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -73,9 +94,19 @@ def add_GossipServiceServicer_to_server(servicer, server):
             ),
             'UpdateNeighbors': grpc.unary_unary_rpc_method_handler(
                     servicer.UpdateNeighbors,
-                    request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+                    request_deserializer=gossip__pb2.NeighborList.FromString,
+                    response_serializer=gossip__pb2.Acknowledgment.SerializeToString,
+            ),
+            'UpdateNeighborsStream': grpc.stream_unary_rpc_method_handler(
+                    servicer.UpdateNeighborsStream,
+                    request_deserializer=gossip__pb2.Neighbor.FromString,
                     response_serializer=gossip__pb2.Acknowledgment.SerializeToString,
             ),
+            'BatchUpdateNeighbors': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchUpdateNeighbors,
+                    request_deserializer=gossip__pb2.NeighborBatch.FromString,
+                    response_serializer=gossip__pb2.BatchAck.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'gossip.GossipService', rpc_method_handlers)
@@ -129,7 +160,7 @@ class GossipService(object):
             request,
             target,
             '/gossip.GossipService/UpdateNeighbors',
-            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            gossip__pb2.NeighborList.SerializeToString,
             gossip__pb2.Acknowledgment.FromString,
             options,
             channel_credentials,
@@ -140,3 +171,57 @@ class GossipService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def UpdateNeighborsStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/gossip.GossipService/UpdateNeighborsStream',
+            gossip__pb2.Neighbor.SerializeToString,
+            gossip__pb2.Acknowledgment.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchUpdateNeighbors(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/gossip.GossipService/BatchUpdateNeighbors',
+            gossip__pb2.NeighborBatch.SerializeToString,
+            gossip__pb2.BatchAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
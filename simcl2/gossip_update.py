@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# gossip_update.py
+# ==============================================================================
+
+import sys
+import grpc
+import gossip_pb2
+import gossip_pb2_grpc
+
+def main():
+    """Forwards the serialized NeighborList on stdin to the local node's UpdateNeighbors."""
+    request = gossip_pb2.NeighborList.FromString(sys.stdin.buffer.read())
+    with grpc.insecure_channel('localhost:5050') as channel:
+        ack = gossip_pb2_grpc.GossipServiceStub(channel).UpdateNeighbors(request, timeout=15)
+    print(ack.details, flush=True)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR:{e}", file=sys.stderr)
+        sys.exit(1)
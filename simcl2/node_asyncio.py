@@ -2,15 +2,57 @@ import asyncio
 import grpc.aio
 import os
 import socket
-from concurrent import futures
+import sys
 import gossip_pb2
 import gossip_pb2_grpc
 import json
+import pickle
 import time
 import sqlite3
-from google.protobuf.empty_pb2 import Empty
+import threading
+from apply_neighbors import apply_neighbors
 
-MAX_CONCURRENT_SENDS = 125
+# orjson serializes log events straight to bytes in C; stdlib json is the fallback
+try:
+    from orjson import dumps as json_dumps
+except ImportError:
+    def json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+MAX_CONCURRENT_SENDS = 125  # send workers draining the outbound queue
+CHANNEL_OPTIONS = [('grpc.keepalive_time_ms', 30000), ('grpc.http2.max_pings_without_data', 0)]
+LOG_BATCH = 256  # events per stdout write at most
+MAX_SEEN_IDS = 10000  # message ids remembered per generation for duplicate detection
+# Last pushed list; the chart points this at an emptyDir so a restarted container comes back with it
+NEIGHBORS_PKL = os.environ.get('NEIGHBORS_PKL', 'neighbors.pkl')
+TOPOLOGY_CONFIGMAP = 'bcgossip-topology'
+TOPO_HASH_KEY = 'bcgossip/topo-hash'
+
+
+class RecentIds:
+    """Set-like dedup memory holding between limit and 2*limit of the newest ids: when the current
+    generation fills it becomes the previous one and the oldest generation is dropped."""
+
+    def __init__(self, limit=MAX_SEEN_IDS):
+        self.limit, self.current, self.previous = limit, set(), set()
+
+    def add(self, msg_id):
+        self.current.add(msg_id)
+        if len(self.current) >= self.limit:
+            self.previous, self.current = self.current, set()
+
+    def __contains__(self, msg_id):
+        return msg_id in self.current or msg_id in self.previous
+
+    def clear(self):
+        self.current.clear()
+        self.previous.clear()
+
+def save_neighbors(neighbors):
+    """Pickles the list next to ned.db; the rename keeps a crash from leaving half a file behind."""
+    with open(NEIGHBORS_PKL + '.tmp', 'wb') as f:
+        pickle.dump(neighbors, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(NEIGHBORS_PKL + '.tmp', NEIGHBORS_PKL)
 
 class Node(gossip_pb2_grpc.GossipServiceServicer):
     def __init__(self, service_name):
@@ -19,11 +61,21 @@ class Node(gossip_pb2_grpc.GossipServiceServicer):
         self.port = '5050'
         self.service_name = service_name
         self.susceptible_nodes = []
-        self.received_message_ids = set()
-        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
-        # We don't necessarily need to call get_neighbors here 
-        # because lazy load will handle it, but it's fine as a fallback.
-        self.get_neighbors()
+        self._neighbors_loaded = False  # set once ned.db or a push has provided a list, even an empty one
+        self.received_message_ids = RecentIds()
+        self._send_q = asyncio.Queue()  # (message, peer_ip, peer_weight, round_count, pending) due for sending
+        # Outbound peer tuples, weight-ascending: all neighbors, and per sending neighbor without it
+        self._sorted_for, self._fanout_all, self._fanout_by_sender = None, (), {}
+        self._channels = {}  # peer_ip -> (channel, stub), kept open across messages
+        self._log_q = asyncio.Queue()  # events waiting for _write_logs
+        # A pushed list survives a container restart through its pickle; otherwise
+        # lazy load would handle ned.db, but reading it here is fine as a fallback.
+        try:
+            with open(NEIGHBORS_PKL, 'rb') as f:
+                self.susceptible_nodes = pickle.load(f)
+            self._neighbors_loaded = True
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.get_neighbors()
 
     def get_neighbors(self):
         """Refreshes neighbor list from SQLite. Handles missing table gracefully."""
@@ -32,26 +84,106 @@ class Node(gossip_pb2_grpc.GossipServiceServicer):
             cursor = conn.execute("SELECT pod_ip, weight FROM NEIGHBORS")
             self.susceptible_nodes = [(row[0], row[1]) for row in cursor]
             conn.close()
+            self._neighbors_loaded = True
+            # ned.db is the newer source now; a restart must not bring back an older pushed list
+            if os.path.exists(NEIGHBORS_PKL):
+                os.remove(NEIGHBORS_PKL)
             print(f"Refreshed: {len(self.susceptible_nodes)} neighbors found.", flush=True)
         except Exception as e:
             # Table might not exist yet if prepare.py hasn't run
             self.susceptible_nodes = []
             print(f"get_neighbors info: {e}", flush=True)
 
+    async def _save_neighbors(self):
+        """Best-effort pickle of the installed list: a failed write only costs restart recovery, not the update."""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, save_neighbors, self.susceptible_nodes)
+        except Exception as e:
+            print(f"Could not save {NEIGHBORS_PKL}: {e}", flush=True)
+
     async def UpdateNeighbors(self, request, context):
-        """Force a manual refresh and clear message cache for new experiments."""
-        print("Received UpdateNeighbors signal. Refreshing state...", flush=True)
-        self.get_neighbors()
+        """Installs the pushed neighbor list in memory (pickled for restarts; no SQLite involved) and clears
+        the message cache. An empty list isolates the pod; reload=True is the refresh signal: reread ned.db."""
+        if request.reload:
+            print("Received UpdateNeighbors signal. Refreshing state...", flush=True)
+            self.get_neighbors()
+        else:
+            self.susceptible_nodes = [(n.pod_ip, n.weight) for n in request.neighbors]
+            self._neighbors_loaded = True
+            print(f"Received {len(self.susceptible_nodes)} neighbors via UpdateNeighbors.", flush=True)
         self.received_message_ids.clear()
+        if not request.reload:
+            await self._save_neighbors()
         return gossip_pb2.Acknowledgment(details="State refreshed.")
 
+    async def UpdateNeighborsStream(self, request_iterator, context):
+        """Client-streaming UpdateNeighbors: rows are decoded as they arrive, and the list is installed once complete."""
+        neighbors = [(n.pod_ip, n.weight) async for n in request_iterator]
+        self.susceptible_nodes = neighbors
+        self._neighbors_loaded = True
+        self.received_message_ids.clear()
+        print(f"Received {len(neighbors)} neighbors via UpdateNeighborsStream.", flush=True)
+        await self._save_neighbors()
+        return gossip_pb2.Acknowledgment(details="State refreshed.")
+
+    async def BatchUpdateNeighbors(self, request, context):
+        """Coordinator role: the driver sends every pod's list here once and this pod fans them out in-cluster."""
+        sem = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+
+        async def push(entry):
+            update = gossip_pb2.NeighborList(neighbors=entry.neighbors)
+            try:
+                if entry.pod_ip == self.host:
+                    await self.UpdateNeighbors(update, context)
+                else:
+                    async with sem, grpc.aio.insecure_channel(f"{entry.pod_ip}:5050") as channel:
+                        await gossip_pb2_grpc.GossipServiceStub(channel).UpdateNeighbors(update, timeout=15)
+                return None
+            except Exception as e:
+                print(f"Batch update to {entry.pod_ip} failed: {e}", flush=True)
+                return entry.pod_ip
+
+        failed = [ip for ip in await asyncio.gather(*(push(e) for e in request.pods)) if ip]
+        print(f"Batch update: {len(request.pods) - len(failed)}/{len(request.pods)} pods updated.", flush=True)
+        return gossip_pb2.BatchAck(updated=len(request.pods) - len(failed), failed=failed)
+
+    async def _refresh_state(self):
+        self.get_neighbors()
+        self.received_message_ids.clear()
+
+    def watch_topology(self, loop):
+        """Background thread: applies this pod's entry whenever the orchestrator publishes the topology ConfigMap,
+        then annotates the pod with the topology hash so the orchestrator knows it is live."""
+        from kubernetes import client, config, watch
+        config.load_incluster_config()
+        v1 = client.CoreV1Api()
+        namespace = os.environ.get('POD_NAMESPACE', 'default')
+        while True:
+            try:
+                for event in watch.Watch().stream(v1.list_namespaced_config_map, namespace,
+                                                  field_selector=f'metadata.name={TOPOLOGY_CONFIGMAP}'):
+                    cm = event['object']
+                    if event['type'] == 'DELETED' or self.hostname not in (cm.data or {}):
+                        continue
+                    # None = ned.db already holds this entry (a watch re-list): keep the live state and
+                    # the dedup memory, but still acknowledge so publish_topology can finish
+                    if apply_neighbors(cm.data[self.hostname]) is not None:
+                        asyncio.run_coroutine_threadsafe(self._refresh_state(), loop).result()
+                    topo_hash = (cm.metadata.annotations or {}).get(TOPO_HASH_KEY)
+                    v1.patch_namespaced_pod(self.hostname, namespace,
+                                            {'metadata': {'annotations': {TOPO_HASH_KEY: topo_hash}}})
+                    print(f"Applied topology {topo_hash} from ConfigMap.", flush=True)
+            except Exception as e:
+                print(f"Topology watch error: {e}", flush=True)
+                time.sleep(5)
+
     async def SendMessage(self, request, context):
         message = request.message
         sender_id = request.sender_id
         received_timestamp = time.time_ns()
         
-        # LAZY LOAD TRIGGER: If we have no neighbors, try to load them now
-        if not self.susceptible_nodes:
+        # LAZY LOAD TRIGGER: only until ned.db has been read once; later changes arrive via UpdateNeighbors
+        if not self._neighbors_loaded:
             self.get_neighbors()
 
         if sender_id == self.host:
@@ -77,24 +209,58 @@ class Node(gossip_pb2_grpc.GossipServiceServicer):
             print("❌ No neighbors found in DB. Stopping propagation.", flush=True)
             return
 
-        tasks = []
-        for peer_ip, peer_weight in self.susceptible_nodes:
-            if peer_ip != sender_id:
-                tasks.append(asyncio.create_task(self._send_gossip_to_peer(message, peer_ip, peer_weight, round_count)))
-        await asyncio.gather(*tasks, return_exceptions=True)
+        # Rebuilt only when the neighbor list object has been replaced
+        if self._sorted_for is not self.susceptible_nodes:
+            self._sorted_for = self.susceptible_nodes
+            self._fanout_all = tuple(sorted(self.susceptible_nodes, key=lambda peer: float(peer[1])))
+            self._fanout_by_sender = {ip: None for ip, _ in self._fanout_all}
+            self._drop_channels(set(self._channels) - set(self._fanout_by_sender))
+
+        # Senders that aren't neighbors get the full list; a neighbor's exclusion list is built on first use
+        peers = self._fanout_by_sender.get(sender_id, self._fanout_all)
+        if peers is None:
+            peers = self._fanout_by_sender[sender_id] = tuple(p for p in self._fanout_all if p[0] != sender_id)
+
+        if not peers:
+            return
+        # One timer per peer serves the link delay, then a send worker picks the send up; no task per peer.
+        # pending = [sends left, future set by the worker finishing the last one]
+        loop = asyncio.get_running_loop()
+        pending = [len(peers), loop.create_future()]
+        for peer_ip, peer_weight in peers:
+            loop.call_later(float(peer_weight) / 1000, self._send_q.put_nowait,
+                            (message, peer_ip, peer_weight, round_count, pending))
+        await pending[1]
+
+    async def _send_worker(self):
+        while True:
+            message, peer_ip, peer_weight, round_count, pending = await self._send_q.get()
+            await self._send_gossip_to_peer(message, peer_ip, peer_weight, round_count)
+            pending[0] -= 1
+            if not pending[0] and not pending[1].done():
+                pending[1].set_result(None)
+
+    def _stub(self, peer_ip):
+        entry = self._channels.get(peer_ip)
+        if entry is None:
+            channel = grpc.aio.insecure_channel(f"{peer_ip}:5050", options=CHANNEL_OPTIONS)
+            entry = self._channels[peer_ip] = (channel, gossip_pb2_grpc.GossipServiceStub(channel))
+        return entry[1]
+
+    def _drop_channels(self, peer_ips):
+        """Closes the pooled channels to peers that are no longer neighbors."""
+        for ip in peer_ips:
+            channel, _ = self._channels.pop(ip)
+            asyncio.create_task(channel.close())
 
     async def _send_gossip_to_peer(self, message, peer_ip, peer_weight, round_count):
-        async with self.semaphore:
-            try:
-                await asyncio.sleep(float(peer_weight) / 1000)
-                async with grpc.aio.insecure_channel(f"{peer_ip}:5050") as channel:
-                    stub = gossip_pb2_grpc.GossipServiceStub(channel)
-                    await stub.SendMessage(gossip_pb2.GossipMessage(
-                        message=message, sender_id=self.host, timestamp=time.time_ns(),
-                        latency_ms=peer_weight, round_count=round_count
-                    ))
-            except Exception as e:
-                print(f"Error sending to {peer_ip}: {e}", flush=True)
+        try:
+            await self._stub(peer_ip).SendMessage(gossip_pb2.GossipMessage(
+                message=message, sender_id=self.host, timestamp=time.time_ns(),
+                latency_ms=peer_weight, round_count=round_count
+            ))
+        except Exception as e:
+            print(f"Error sending to {peer_ip}: {e}", flush=True)
 
     def _log_event(self, message, sender_id, received_timestamp, propagation_time, incoming_link_latency, event_type, detail, round_count):
         event_data = {
@@ -103,15 +269,44 @@ class Node(gossip_pb2_grpc.GossipServiceServicer):
             'incoming_link_latency': incoming_link_latency, 'round_count': round_count,
             'event_type': event_type, 'detail': detail
         }
-        print(json.dumps(event_data), flush=True)
+        self._log_q.put_nowait(event_data)
+
+    async def _write_logs(self):
+        """Drains queued events to stdout, one os.write per batch instead of a locked print and flush per message."""
+        fd = sys.stdout.fileno()
+        while True:
+            items = [await self._log_q.get()]
+            while not self._log_q.empty() and len(items) < LOG_BATCH:
+                items.append(self._log_q.get_nowait())
+            data = memoryview(b"".join(json_dumps(e) + b"\n" for e in items))
+            # A pipe may take only part of a large batch per call
+            while data:
+                data = data[os.write(fd, data):]
 
     async def start_server(self):
-        server = grpc.aio.server(futures.ThreadPoolExecutor(max_workers=10))
+        # aio handlers run on the event loop; a thread pool would only serve sync interceptors
+        server = grpc.aio.server()
         gossip_pb2_grpc.add_GossipServiceServicer_to_server(self, server)
         server.add_insecure_port(f'[::]:{self.port}')
         print(f"Node listening on {self.port}", flush=True)
         await server.start()
-        await server.wait_for_termination()
+        log_writer = asyncio.create_task(self._write_logs())
+        send_workers = [asyncio.create_task(self._send_worker()) for _ in range(MAX_CONCURRENT_SENDS)]
+        if 'KUBERNETES_SERVICE_HOST' in os.environ:
+            threading.Thread(target=self.watch_topology, args=(asyncio.get_running_loop(),), daemon=True).start()
+        try:
+            await server.wait_for_termination()
+        finally:
+            log_writer.cancel()
+            for worker in send_workers:
+                worker.cancel()
+            await asyncio.gather(*(channel.close() for channel, _ in self._channels.values()))
 
 if __name__ == '__main__':
+    # libuv-backed event loop for the many small sends and timers; stdlib asyncio is the fallback
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(Node('bcgossip-svc').start_server())
\ No newline at end of file